@@ -0,0 +1,275 @@
+import json
+import struct
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Files are already encrypted client-side, so entries are stored without compression
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_COUNT_LIMIT = 0xFFFF
+_MARKER_32 = 0xFFFFFFFF  # Field value telling readers to look in the ZIP64 extra instead
+_MARKER_16 = 0xFFFF
+FLAG_DATA_DESCRIPTOR = 0x08
+FLAG_UTF8 = 0x800
+
+READ_AHEAD = 8                # Objects opened ahead of the one being written
+CHUNK_SIZE = 1024 * 1024      # Bytes read from S3 per chunk
+PART_SIZE = 8 * 1024 * 1024   # Multipart upload part size, S3 needs at least 5 MiB
+MAX_PARTS_IN_FLIGHT = 2
+
+ARCHIVE_PREFIX = 'archives'  # Expired by the bucket's lifecycle rule
+
+
+def _dos_datetime(timestamp):
+    t = time.gmtime(timestamp)
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((max(t.tm_year, 1980) - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+
+def iter_zip(entries, timestamp=None):
+    """Stream a ZIP archive from (name, size, chunks) entries without buffering it.
+
+    size is the expected entry size, used to decide up front whether the entry
+    needs ZIP64 fields. CRCs are computed while streaming and written in a data
+    descriptor after each entry, so nothing has to be read twice.
+    """
+    dos_time, dos_date = _dos_datetime(timestamp if timestamp is not None else time.time())
+    flags = FLAG_DATA_DESCRIPTOR | FLAG_UTF8
+    central_directory = []
+    offset = 0
+
+    for name, size, chunks in entries:
+        encoded_name = name.encode('utf-8')
+        zip64 = size >= ZIP64_LIMIT
+        version = 45 if zip64 else 20
+        extra = struct.pack('<HHQQ', 0x0001, 16, 0, 0) if zip64 else b''
+        placeholder = _MARKER_32 if zip64 else 0
+
+        header = struct.pack(
+            '<IHHHHHIIIHH', 0x04034b50, version, flags, 0, dos_time, dos_date,
+            0, placeholder, placeholder, len(encoded_name), len(extra)
+        ) + encoded_name + extra
+        header_offset = offset
+        offset += len(header)
+        yield header
+
+        crc = 0
+        written = 0
+        for chunk in chunks:
+            crc = zlib.crc32(chunk, crc)
+            written += len(chunk)
+            yield chunk
+        if written >= ZIP64_LIMIT and not zip64:
+            raise ValueError(f"{name} grew past 4 GiB after its header was written")
+        offset += written
+
+        if zip64:
+            descriptor = struct.pack('<IIQQ', 0x08074b50, crc, written, written)
+        else:
+            descriptor = struct.pack('<IIII', 0x08074b50, crc, written, written)
+        offset += len(descriptor)
+        yield descriptor
+
+        central_directory.append((encoded_name, crc, written, header_offset))
+
+    cd_offset = offset
+    cd_size = 0
+    for encoded_name, crc, written, header_offset in central_directory:
+        zip64_fields = []
+        if written >= ZIP64_LIMIT:
+            zip64_fields += [written, written]
+        if header_offset >= ZIP64_LIMIT:
+            zip64_fields.append(header_offset)
+        extra = struct.pack(f'<HH{len(zip64_fields)}Q', 0x0001, 8 * len(zip64_fields), *zip64_fields) if zip64_fields else b''
+        size_field = _MARKER_32 if written >= ZIP64_LIMIT else written
+        offset_field = _MARKER_32 if header_offset >= ZIP64_LIMIT else header_offset
+        # Any ZIP64 extra needs version 4.5, even when the local header didn't
+        version = 45 if zip64_fields else 20
+
+        record = struct.pack(
+            '<IHHHHHHIIIHHHHHII', 0x02014b50, version, version, flags, 0, dos_time, dos_date,
+            crc, size_field, size_field, len(encoded_name), len(extra), 0, 0, 0, 0, offset_field
+        ) + encoded_name + extra
+        cd_size += len(record)
+        yield record
+
+    count = len(central_directory)
+    count_field = _MARKER_16 if count >= ZIP64_COUNT_LIMIT else count
+    cd_size_field = _MARKER_32 if cd_size >= ZIP64_LIMIT else cd_size
+    cd_offset_field = _MARKER_32 if cd_offset >= ZIP64_LIMIT else cd_offset
+    if (count_field, cd_size_field, cd_offset_field) != (count, cd_size, cd_offset):
+        zip64_end_offset = cd_offset + cd_size
+        yield struct.pack('<IQHHIIQQQQ', 0x06064b50, 44, 45, 45, 0, 0, count, count, cd_size, cd_offset)
+        yield struct.pack('<IIQI', 0x07064b50, 0, zip64_end_offset, 1)
+
+    yield struct.pack(
+        '<IHHHHIIH', 0x06054b50, 0, 0, count_field, count_field, cd_size_field, cd_offset_field, 0
+    )
+
+
+def _open_object(s3_client, bucket, key, chunk_size):
+    response = s3_client.get_object(Bucket=bucket, Key=key)
+    body = response['Body']
+    # Small objects are read completely in the background, large ones just get their first chunk
+    return response['ContentLength'], body.read(chunk_size), body
+
+
+def _iter_body(first_chunk, body, chunk_size):
+    try:
+        if first_chunk:
+            yield first_chunk
+        while True:
+            chunk = body.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        body.close()
+
+
+def iter_s3_objects(s3_client, bucket, keys, read_ahead=READ_AHEAD, chunk_size=CHUNK_SIZE):
+    """Yield (key, size, chunks) for each key in order, opening up to read_ahead objects early.
+
+    Each object's chunks must be consumed before moving on to the next one.
+    Memory stays around read_ahead * chunk_size no matter how many objects
+    or bytes are read.
+    """
+    keys = iter(keys)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=read_ahead) as executor:
+        def fill():
+            while len(pending) < read_ahead:
+                key = next(keys, None)
+                if key is None:
+                    return
+                pending.append((key, executor.submit(_open_object, s3_client, bucket, key, chunk_size)))
+
+        fill()
+        try:
+            while pending:
+                key, future = pending.popleft()
+                size, first_chunk, body = future.result()
+                fill()
+                yield key, size, _iter_body(first_chunk, body, chunk_size)
+        finally:
+            # Close anything opened ahead if the caller stopped early
+            for _, future in pending:
+                if not future.cancel():
+                    try:
+                        future.result()[2].close()
+                    except Exception:
+                        pass
+
+
+class MultipartWriter:
+    """Upload a stream of chunks to S3 as a multipart upload with bounded memory.
+
+    Parts are uploaded in the background while the next one fills, with at
+    most MAX_PARTS_IN_FLIGHT parts outstanding.
+    """
+
+    def __init__(self, s3_client, bucket, key, content_type='application/zip', part_size=PART_SIZE):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.size = 0
+        self._buffer = bytearray()
+        self._parts = deque()
+        self._completed = []
+        self._executor = ThreadPoolExecutor(max_workers=MAX_PARTS_IN_FLIGHT)
+        response = s3_client.create_multipart_upload(Bucket=bucket, Key=key, ContentType=content_type)
+        self.upload_id = response['UploadId']
+
+    def _upload_part(self, part_number, data):
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=data
+        )
+        return {'PartNumber': part_number, 'ETag': response['ETag']}
+
+    def _flush(self, data):
+        while len(self._parts) >= MAX_PARTS_IN_FLIGHT:
+            self._completed.append(self._parts.popleft().result())
+        part_number = len(self._completed) + len(self._parts) + 1
+        self._parts.append(self._executor.submit(self._upload_part, part_number, bytes(data)))
+
+    def write(self, chunk):
+        self.size += len(chunk)
+        self._buffer += chunk
+        while len(self._buffer) >= self.part_size:
+            self._flush(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+
+    def close(self):
+        if self._buffer or not (self._completed or self._parts):
+            self._flush(self._buffer)
+            self._buffer = bytearray()
+        while self._parts:
+            self._completed.append(self._parts.popleft().result())
+        self._executor.shutdown()
+        self.s3_client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={'Parts': self._completed}
+        )
+
+    def abort(self):
+        for future in self._parts:
+            future.cancel()
+        self._executor.shutdown()
+        self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+
+
+def archive_keys(user_id, archive_id):
+    """Return the S3 keys of an archive and of the status object tracking its build."""
+    base = f"{ARCHIVE_PREFIX}/{user_id}/{archive_id}"
+    return f"{base}.zip", f"{base}.json"
+
+
+def put_status(s3_client, bucket, key, status):
+    s3_client.put_object(Bucket=bucket, Key=key, Body=json.dumps(status).encode('utf-8'), ContentType='application/json')
+
+
+def get_file_items(dynamodb, file_ids):
+    """Fetch secdrive_user_files items by file_id, returned as a dict keyed by file_id."""
+    # BatchGetItem takes at most 100 keys per call and may hand some back unprocessed
+    items = {}
+    for start in range(0, len(file_ids), 100):
+        request = {'secdrive_user_files': {'Keys': [{'file_id': file_id} for file_id in file_ids[start:start + 100]]}}
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response['Responses'].get('secdrive_user_files', []):
+                items[item['file_id']] = item
+            request = response.get('UnprocessedKeys')
+    return items
+
+
+def archive_names(items):
+    """Return a unique path inside the archive for each item, in order.
+
+    Repeated names get a " (n)" suffix like browsers use, skipping any suffix
+    another file already has. Names are compared case-insensitively, since
+    that is how they are extracted on Windows and macOS.
+    """
+    used = set()
+    counts = {}
+    names = []
+    for item in items:
+        name = item.get('file_name', item['file_id']).replace('\\', '/').split('/')[-1] or item['file_id']
+        stem, dot, extension = name.rpartition('.')
+        candidate = name
+        count = counts.get(name.lower(), 0)
+        while candidate.lower() in used:
+            count += 1
+            candidate = f"{stem} ({count}).{extension}" if dot and stem else f"{name} ({count})"
+        counts[name.lower()] = count
+        used.add(candidate.lower())
+        names.append(f"files/{candidate}")
+    return names
@@ -0,0 +1,144 @@
+"""Throughput and peak memory of the streamed archive download.
+
+Builds archives through build_archive's pipeline (pipelined S3 reads,
+streaming ZIP writer, multipart upload) against an in-process S3 stand-in
+that adds a fixed first-byte latency per object and discards uploaded parts.
+Downloads and uploads are each held to a bandwidth cap, like a Lambda's
+network link, so times for large archives can be compared with
+build_archive's timeout. The large case is a 3 GiB archive.
+
+Run from the backend directory:
+    python benchmarks/bench_archive.py [--latency-ms 20] [--bandwidth-mib 75] [--skip-large]
+"""
+import argparse
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import archive
+import build_archive
+
+LAMBDA_TIMEOUT = 900  # terraform's archive_lambda_timeout, used by build_archive
+_BLOCK = os.urandom(archive.CHUNK_SIZE)
+
+
+class _Link:
+    """One direction of a network link, shared by every thread using it."""
+
+    def __init__(self, bytes_per_second):
+        self.bytes_per_second = bytes_per_second
+        self._free_at = 0.0
+        self._lock = threading.Lock()
+
+    def transfer(self, size):
+        if not self.bytes_per_second:
+            return
+        with self._lock:
+            now = time.perf_counter()
+            self._free_at = max(self._free_at, now) + size / self.bytes_per_second
+            done_at = self._free_at
+        time.sleep(max(0.0, done_at - now))
+
+
+class _Body:
+    def __init__(self, size, link):
+        self.remaining = size
+        self.link = link
+
+    def read(self, amount):
+        amount = min(amount, self.remaining, len(_BLOCK))
+        self.remaining -= amount
+        self.link.transfer(amount)
+        return _BLOCK[:amount]
+
+    def close(self):
+        pass
+
+
+class FakeS3:
+    """Serves objects named '<size>/<n>' and throws away multipart parts."""
+
+    def __init__(self, latency, bandwidth):
+        self.latency = latency
+        self.download = _Link(bandwidth)
+        self.upload = _Link(bandwidth)
+        self.get_calls = 0
+        self.parts = 0
+
+    def get_object(self, Bucket, Key):
+        self.get_calls += 1
+        time.sleep(self.latency)
+        size = int(Key.split('/')[0])
+        return {'ContentLength': size, 'Body': _Body(size, self.download)}
+
+    def create_multipart_upload(self, **kwargs):
+        return {'UploadId': 'bench'}
+
+    def upload_part(self, PartNumber, Body, **kwargs):
+        self.parts += 1
+        self.upload.transfer(len(Body))
+        return {'ETag': f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, **kwargs):
+        pass
+
+    def abort_multipart_upload(self, **kwargs):
+        pass
+
+
+def build(s3, keys, read_ahead):
+    writer = archive.MultipartWriter(s3, 'bench', 'archive.zip')
+    objects = archive.iter_s3_objects(s3, 'bench', keys, read_ahead=read_ahead)
+    for chunk in archive.iter_zip((f'files/{n}', size, chunks) for n, (_, size, chunks) in enumerate(objects)):
+        writer.write(chunk)
+    writer.close()
+    return writer.size
+
+
+def run(label, keys, latency, bandwidth, read_ahead, trace):
+    s3 = FakeS3(latency, bandwidth)
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    size = build(s3, keys, read_ahead)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] if trace else None
+    if trace:
+        tracemalloc.stop()
+    peak_str = f"{peak / (1024 * 1024):.1f}" if peak is not None else '-'
+    fits = 'yes' if elapsed < LAMBDA_TIMEOUT - build_archive.DEADLINE_MARGIN_MS / 1000 else 'no'
+    print(f"{label:<34}{read_ahead:>6}{size / (1024 * 1024):>12.0f}{elapsed:>9.2f}{size / (1024 * 1024) / elapsed:>10.0f}{peak_str:>12}{fits:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency-ms', type=float, default=20, help='simulated S3 first-byte latency')
+    parser.add_argument('--bandwidth-mib', type=float, default=75,
+                        help='simulated S3 bandwidth in MiB/s for each direction, 0 for unlimited')
+    parser.add_argument('--skip-large', action='store_true', help='skip the multi-GB archive')
+    args = parser.parse_args()
+    latency = args.latency_ms / 1000
+    bandwidth = args.bandwidth_mib * 1024 * 1024
+
+    many_small = [f'{256 * 1024}/{n}' for n in range(1000)]
+    multi_gb = [f'{1024 * 1024 * 1024}/{n}' for n in range(3)]
+
+    print(f"Bandwidth {args.bandwidth_mib:g} MiB/s each way, {args.latency_ms:g} ms first-byte latency")
+    print(f"'fits' means done {build_archive.DEADLINE_MARGIN_MS / 1000:g}s before the {LAMBDA_TIMEOUT}s timeout\n")
+    print(f"{'archive':<34}{'ahead':>6}{'MiB':>12}{'sec':>9}{'MiB/s':>10}{'peak MiB':>12}{'fits':>7}")
+    run('1k files x 256 KiB', many_small, latency, bandwidth, 1, trace=False)
+    run('1k files x 256 KiB', many_small, latency, bandwidth, archive.READ_AHEAD, trace=False)
+    run('1k files x 256 KiB (traced)', many_small, latency, bandwidth, archive.READ_AHEAD, trace=True)
+    if not args.skip_large:
+        run('3 files x 1 GiB', multi_gb, latency, bandwidth, archive.READ_AHEAD, trace=False)
+        run('3 files x 1 GiB (traced)', multi_gb, latency, bandwidth, archive.READ_AHEAD, trace=True)
+    print(f"\nProcess max RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,326 @@
+"""Microbenchmarks for every lambda_handler, checked against committed baselines.
+
+Each scenario calls a handler in-process against the stand-ins in
+stand_ins.py, with users seeded by synthetic.py. Per scenario it records
+median and p95 latency, peak traced memory and allocated blocks of one call,
+and the AWS calls one call makes. Results are compared with baselines.json.
+The run fails when memory or allocated blocks regress by more than the
+tolerance, or when a handler makes more AWS calls than before.
+
+Latency depends on the machine, so it is only checked with --check-latency,
+against baselines regenerated with --update-baselines on the same machine.
+p95 is reported but never checked, it is too noisy on shared machines.
+
+Run from the backend directory:
+    python benchmarks/bench_handlers.py [--sizes 10,1000,10000,100000] [--only get_user_data]
+    python benchmarks/bench_handlers.py --update-baselines
+    python benchmarks/bench_handlers.py --check-latency
+"""
+import argparse
+import base64
+import contextlib
+import gc
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+sys.path.insert(0, BENCH_DIR)
+
+import archive
+import build_archive
+import confirm_upload
+import decrypt_data_key
+import delete_file
+import download_archive
+import generate_data_key
+import generate_presigned_url
+import get_user_data
+import get_user_profile
+import store_user_data
+import throttle
+from stand_ins import FakeAWS
+from synthetic import make_file, seed_user
+
+BASELINES_PATH = os.path.join(BENCH_DIR, 'baselines.json')
+DEFAULT_SIZES = [10, 1000, 10000, 100000]
+ROUNDS = 5  # Median latency is the best of the per-round medians, which filters out noisy neighbours
+DEFAULT_TOLERANCE = 0.25
+# Differences below these are noise, whatever the ratio
+LATENCY_FLOOR_MS = 0.05
+MEMORY_FLOOR_KIB = 32
+BLOCKS_FLOOR = 100
+
+
+class Scenario:
+    """A handler call to measure.
+
+    prepare(aws, rng) runs untimed before every call and returns the event,
+    so calls that consume state (deletes, cold caches) start from the same
+    point each time.
+    """
+
+    def __init__(self, name, handler, prepare, iterations, expected_status=200):
+        self.name = name
+        self.handler = handler
+        self.prepare = prepare
+        self.iterations = iterations
+        self.expected_status = expected_status
+
+
+# Payload format 1.0, which the API Gateway integrations use
+REQUEST_CONTEXT = {'identity': {'sourceIp': '198.51.100.10'}}
+
+
+def _post(body, query=None):
+    return {'body': json.dumps(body), 'queryStringParameters': query or {},
+            'headers': {'accept-encoding': 'gzip, deflate, br'}, 'requestContext': REQUEST_CONTEXT}
+
+
+def _get(query):
+    return {'queryStringParameters': query, 'headers': {'accept-encoding': 'gzip, deflate, br'},
+            'requestContext': REQUEST_CONTEXT}
+
+
+def build_scenarios(aws, rng, sizes):
+    scenarios = []
+
+    for size in sizes:
+        user_id = f'listing-{size}'
+        seed_user(aws, rng, user_id, size)
+        scenarios.append(Scenario(
+            f'get_user_data[{size}]', get_user_data.lambda_handler,
+            lambda aws, rng, user_id=user_id: _get({'user_id': user_id}),
+            iterations=max(3, min(200, 20000 // size))
+        ))
+
+    seed_user(aws, rng, 'profile-user', 0)
+
+    def profile_cold(aws, rng):
+        get_user_profile._profile_cache.clear()
+        return _get({'user_id': 'profile-user'})
+
+    def profile_warm(aws, rng):
+        if 'profile-user' not in get_user_profile._profile_cache:
+            with contextlib.redirect_stdout(io.StringIO()):
+                get_user_profile.lambda_handler(_get({'user_id': 'profile-user'}), None)
+        return _get({'user_id': 'profile-user'})
+
+    scenarios.append(Scenario('get_user_profile[cold]', get_user_profile.lambda_handler, profile_cold, 500))
+    scenarios.append(Scenario('get_user_profile[warm]', get_user_profile.lambda_handler, profile_warm, 500))
+
+    def register(aws, rng):
+        return _post({'user_id': f'new-{rng.getrandbits(64)}', 'email': 'new@example.com',
+                      'firstName': 'New', 'lastName': 'User'}, {'operation': 'register'})
+
+    def update_changed(aws, rng):
+        return _post({'user_id': 'profile-user', 'first_name': f'Name{rng.getrandbits(32)}'}, {'operation': 'update'})
+
+    def update_unchanged(aws, rng):
+        return _post({'user_id': 'profile-user', 'last_name': 'Unchanged'}, {'operation': 'update'})
+
+    aws.tables['secdrive_users'].items['profile-user']['last_name'] = 'Unchanged'
+    scenarios.append(Scenario('store_user_data[register]', store_user_data.lambda_handler, register, 500))
+    scenarios.append(Scenario('store_user_data[update]', store_user_data.lambda_handler, update_changed, 500))
+    scenarios.append(Scenario('store_user_data[unchanged]', store_user_data.lambda_handler, update_unchanged, 500))
+
+    scenarios.append(Scenario(
+        'generate_presigned_url', generate_presigned_url.lambda_handler,
+        lambda aws, rng: _post({'user_id': 'profile-user', 'file_name': 'report.pdf', 'file_size': 12345,
+                                'content_type': 'application/pdf'}),
+        iterations=500
+    ))
+
+    def confirm(aws, rng):
+        item = make_file(rng, 'profile-user', 0)
+        return _post({'file_id': item['file_id'], 'user_id': 'profile-user', 'file_name': item['file_name'],
+                      'file_size': item['file_size'], 's3_key': item['s3_key'],
+                      'content_type': item['content_type'], 'encrypted_key': item.get('encrypted_key')})
+
+    scenarios.append(Scenario('confirm_upload', confirm_upload.lambda_handler, confirm, 500))
+
+    def delete(aws, rng):
+        item = seed_user(aws, rng, 'delete-user', 1, object_size=16)[0]
+        return _post({'file_id': item['file_id'], 'user_id': 'delete-user'})
+
+    scenarios.append(Scenario('delete_file', delete_file.lambda_handler, delete, 500))
+
+    scenarios.append(Scenario(
+        'generate_data_key', generate_data_key.lambda_handler,
+        lambda aws, rng: _post({'user_id': 'profile-user'}), iterations=500
+    ))
+    scenarios.append(Scenario(
+        'decrypt_data_key', decrypt_data_key.lambda_handler,
+        lambda aws, rng: _post({'user_id': 'profile-user',
+                                'encrypted_key': base64.b64encode(rng.randbytes(184)).decode('utf-8')}),
+        iterations=500
+    ))
+
+    archive_files = seed_user(aws, rng, 'archive-user', 100, object_size=4096)
+    archive_request = {'user_id': 'archive-user', 'file_ids': [item['file_id'] for item in archive_files]}
+    scenarios.append(Scenario(
+        'download_archive[100]', download_archive.lambda_handler,
+        lambda aws, rng: _post(archive_request), iterations=200, expected_status=202
+    ))
+    archive_id = '00000000-0000-4000-8000-000000000000'
+    scenarios.append(Scenario(
+        'build_archive[100]', build_archive.lambda_handler,
+        lambda aws, rng: dict(archive_request, archive_id=archive_id), iterations=20
+    ))
+    # Seeded directly so the poll can run without the build scenario
+    aws.s3.objects[archive.archive_keys('archive-user', archive_id)[1]] = json.dumps({
+        'status': 'ready', 'file_count': 100, 'archive_size': 420000, 'created': '2025-06-02T21:56:00'
+    }).encode('utf-8')
+    scenarios.append(Scenario(
+        'download_archive[status]', download_archive.lambda_handler,
+        lambda aws, rng: _get({'user_id': 'archive-user', 'archive_id': archive_id}), iterations=500
+    ))
+
+    return scenarios
+
+
+def run_scenario(aws, rng, scenario):
+    latencies = []
+    calls = None
+    sink = io.StringIO()
+
+    def call():
+        event = scenario.prepare(aws, rng)
+        # Each call starts with an empty rate limiter so repeated calls are never throttled
+        throttle._limiter = throttle.RateLimiter()
+        aws.calls.clear()
+        with contextlib.redirect_stdout(sink):
+            start = time.perf_counter()
+            response = scenario.handler(event, None)
+            elapsed = time.perf_counter() - start
+        # build_archive is invoked asynchronously and reports through its status object instead
+        status_code = response.get('statusCode', 200 if response.get('status') == 'ready' else 500)
+        if status_code != scenario.expected_status:
+            raise RuntimeError(f"{scenario.name} returned {status_code}: {str(response.get('body', response))[:200]}")
+        sink.seek(0)
+        sink.truncate()
+        return elapsed
+
+    call()  # Warm-up, imports and first-use setup aren't part of the steady state
+    rounds = min(ROUNDS, scenario.iterations)
+    round_medians = []
+    for _ in range(rounds):
+        round_latencies = []
+        for _ in range(scenario.iterations // rounds):
+            round_latencies.append(call())
+            calls = dict(aws.calls)
+        round_medians.append(statistics.median(round_latencies))
+        latencies += round_latencies
+
+    tracemalloc.start()
+    call()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    # Blocks still allocated after one call, without the collector freeing anything mid-call
+    gc.collect()
+    gc.disable()
+    try:
+        before = sys.getallocatedblocks()
+        call()
+        blocks = sys.getallocatedblocks() - before
+    finally:
+        gc.enable()
+
+    latencies.sort()
+    return {
+        'median_ms': round(min(round_medians) * 1000, 4),
+        'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 4),
+        'peak_kib': round(peak / 1024, 1),
+        'alloc_blocks': blocks,
+        'aws_calls': dict(sorted(calls.items()))
+    }
+
+
+def compare(name, result, baseline, tolerance, check_latency):
+    problems = []
+    metrics = [('peak_kib', MEMORY_FLOOR_KIB), ('alloc_blocks', BLOCKS_FLOOR)]
+    if check_latency:
+        metrics.insert(0, ('median_ms', LATENCY_FLOOR_MS))
+    for metric, floor in metrics:
+        if metric not in baseline:
+            continue
+        old, new = baseline[metric], result[metric]
+        if new > old * (1 + tolerance) and new - old > floor:
+            problems.append(f"{metric} {old} -> {new} (+{100 * (new - old) / old:.0f}%)")
+    for operation, count in result['aws_calls'].items():
+        old = baseline['aws_calls'].get(operation, 0)
+        if count > old:
+            problems.append(f"{operation} calls {old} -> {count}")
+    return [f"{name}: {problem}" for problem in problems]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma separated file counts for the get_user_data listings')
+    parser.add_argument('--only', help='run only scenarios whose name starts with this')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed relative slowdown before a metric counts as a regression')
+    parser.add_argument('--check-latency', action='store_true',
+                        help='also fail on median latency, only meaningful against baselines from this machine')
+    parser.add_argument('--update-baselines', action='store_true', help='write the results to baselines.json')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    aws = FakeAWS()
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+
+    with aws.patched():
+        scenarios = build_scenarios(aws, rng, sizes)
+        if args.only:
+            scenarios = [scenario for scenario in scenarios if scenario.name.startswith(args.only)]
+
+        results = {}
+        print(f"{'scenario':<30}{'median ms':>11}{'p95 ms':>10}{'peak KiB':>10}{'blocks':>9}  aws calls")
+        for scenario in scenarios:
+            result = run_scenario(aws, rng, scenario)
+            results[scenario.name] = result
+            calls = ', '.join(f"{operation}={count}" for operation, count in result['aws_calls'].items())
+            print(f"{scenario.name:<30}{result['median_ms']:>11.3f}{result['p95_ms']:>10.3f}{result['peak_kib']:>10.1f}{result['alloc_blocks']:>9}  {calls}")
+
+    baselines = {}
+    if os.path.exists(BASELINES_PATH):
+        with open(BASELINES_PATH) as f:
+            baselines = json.load(f)
+
+    if args.update_baselines:
+        baselines.update(results)
+        with open(BASELINES_PATH, 'w') as f:
+            json.dump(dict(sorted(baselines.items())), f, indent=2)
+            f.write('\n')
+        print(f"\nWrote {len(results)} baselines to {os.path.relpath(BASELINES_PATH)}")
+        return
+
+    regressions = []
+    missing = []
+    for name, result in results.items():
+        if name in baselines:
+            regressions += compare(name, result, baselines[name], args.tolerance, args.check_latency)
+        else:
+            missing.append(name)
+
+    if missing:
+        print(f"\nNo baseline for: {', '.join(missing)}")
+    if regressions:
+        print(f"\nRegressions beyond {100 * args.tolerance:.0f}% tolerance:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("\nNo regressions against baselines")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Serialization CPU time and payload size for large getUserData listings.
+
+Run from the backend directory:
+    python benchmarks/bench_serialization.py [--files 10000] [--repeat 20]
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import timeit
+import uuid
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import responses
+
+try:
+    import simplejson
+except ImportError:
+    simplejson = None
+
+
+def build_listing(num_files):
+    # Mirrors the shape get_user_data returns, with Decimals as DynamoDB would hand them back
+    files = []
+    for i in range(num_files):
+        file_id = str(uuid.uuid4())
+        files.append({
+            'id': file_id,
+            'name': f'document_{i}.pdf',
+            'type': 'pdf',
+            'size': f'{(i % 900) + 1}.{i % 10} KB',
+            'modified': '2025-06-02 21:56',
+            'url': f'https://secdrive-user-files-nknez.s3.amazonaws.com/user/{file_id}_document_{i}.pdf'
+                   f'?X-Amz-Algorithm=AWS4-HMAC-SHA256&X-Amz-Expires=3600&X-Amz-Signature={uuid.uuid4().hex * 2}',
+            'isFolder': False,
+            'isEncrypted': True,
+            'encryptedKey': base64.b64encode(os.urandom(184)).decode('ascii'),
+            'fileSize': Decimal(i * 1024 + 17)
+        })
+    return {'files': files, 'total_files': Decimal(num_files)}
+
+
+def stdlib_default(obj):
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else str(obj)
+    raise TypeError(type(obj).__name__)
+
+
+def time_call(fn, repeat):
+    return min(timeit.repeat(fn, number=1, repeat=repeat)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    payload = build_listing(args.files)
+    event = {'headers': {'accept-encoding': 'gzip, deflate, br'}}
+
+    print(f"Listing with {args.files} files, best of {args.repeat} runs\n")
+    print(f"{'encoder':<28}{'ms':>10}")
+    if simplejson is not None:
+        print(f"{'simplejson.dumps':<28}{time_call(lambda: simplejson.dumps(payload), args.repeat):>10.2f}")
+    print(f"{'json.dumps(default=...)':<28}{time_call(lambda: json.dumps(payload, default=stdlib_default), args.repeat):>10.2f}")
+    print(f"{'responses.dumps':<28}{time_call(lambda: responses.dumps(payload), args.repeat):>10.2f}")
+    print(f"{'responses.json_response':<28}{time_call(lambda: responses.json_response(200, payload, event), args.repeat):>10.2f}")
+
+    raw = responses.dumps(payload).encode('utf-8')
+    print(f"\n{'encoding':<28}{'bytes':>12}{'ratio':>10}{'ms':>10}")
+    print(f"{'identity':<28}{len(raw):>12}{1.0:>10.2f}{0.0:>10.2f}")
+    encodings = ['gzip'] + (['br'] if responses.brotli is not None else [])
+    for encoding in encodings:
+        compressed = responses.compress(raw, encoding)
+        elapsed = time_call(lambda: responses.compress(raw, encoding), args.repeat)
+        print(f"{encoding:<28}{len(compressed):>12}{len(raw) / len(compressed):>10.2f}{elapsed:>10.2f}")
+        print(f"{encoding + ' (base64 body)':<28}{len(base64.b64encode(compressed)):>12}")
+
+
+if __name__ == '__main__':
+    main()
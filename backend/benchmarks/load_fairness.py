@@ -0,0 +1,175 @@
+"""Load test for the per-user rate limiter under skewed traffic.
+
+Simulates a few noisy clients hammering the KMS routes (like ddos.sh) next to
+many normal users, spread over several warm containers that share one counter
+table. Two more attackers try to get around the per-user limit: one sends a
+new user_id with every request, the other sends a normal user's user_id from
+its own address to lock that user out. Some normal users share one address
+with one of the noisy clients, like an office behind NAT. Requests go through
+throttle.admit with API Gateway event shapes, so the source address is read
+the way the handlers read it. Runs on a simulated clock, so it finishes in a
+few seconds.
+
+Run from the backend directory:
+    python benchmarks/load_fairness.py [--seconds 300] [--containers 4] [--payload-format 1.0]
+"""
+import argparse
+import contextlib
+import itertools
+import os
+import random
+import sys
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import throttle
+
+NAT_ADDRESS = '192.0.2.1'
+NORMAL_ROUTES = ['get_user_profile', 'get_user_data', 'generate_presigned_url', 'confirm_upload',
+                 'generate_data_key', 'decrypt_data_key', 'delete_file']
+
+
+class SharedCounterTable:
+    """Stands in for secdrive_rate_limits, shared by every simulated container."""
+
+    def __init__(self):
+        self.items = defaultdict(int)
+        self.update_calls = 0
+
+    def update_item(self, Key, ExpressionAttributeValues, **kwargs):
+        self.update_calls += 1
+        self.items[Key['limit_key']] += ExpressionAttributeValues[':pending']
+        return {'Attributes': {'consumed': self.items[Key['limit_key']]}}
+
+
+class Clock:
+    def __init__(self, start):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+
+def build_schedule(args, rng):
+    # (time, client, user_id, source_ip, route) for every request, normal users send one every few seconds
+    requests = []
+
+    def flood(client, user_ids, source_ip):
+        for n in range(int(args.seconds * args.noisy_rate)):
+            t = n / args.noisy_rate + rng.random() / args.noisy_rate
+            requests.append((t, client, next(user_ids), source_ip, 'decrypt_data_key'))
+
+    for i in range(args.noisy_users):
+        # The last noisy client shares the office address with the NAT users
+        source_ip = NAT_ADDRESS if i == args.noisy_users - 1 else f'203.0.113.{i}'
+        flood(f'noisy-{i}', itertools.repeat(f'noisy-{i}'), source_ip)
+    flood('rotating-0', (f'rotating-{n}' for n in itertools.count()), '198.51.100.1')
+    flood('spoofing-0', itertools.repeat('user-0'), '198.51.100.2')
+
+    for i in range(args.normal_users):
+        source_ip = NAT_ADDRESS if i < args.nat_users else f'10.0.{i // 256}.{i % 256}'
+        t = rng.random()
+        while t < args.seconds:
+            requests.append((t, f'user-{i}', f'user-{i}', source_ip, rng.choice(NORMAL_ROUTES)))
+            t += rng.expovariate(args.normal_rate)
+    requests.sort()
+    return requests
+
+
+def make_event(source_ip, payload_format):
+    # Only the parts of an HTTP API proxy event that admit reads
+    if payload_format == '2.0':
+        return {'requestContext': {'http': {'sourceIp': source_ip}}}
+    return {'requestContext': {'identity': {'sourceIp': source_ip}}}
+
+
+def jain_index(values):
+    if not values or not any(values):
+        return 1.0
+    return sum(values) ** 2 / (len(values) * sum(v * v for v in values))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=int, default=300)
+    parser.add_argument('--containers', type=int, default=4)
+    parser.add_argument('--noisy-users', type=int, default=2)
+    parser.add_argument('--noisy-rate', type=float, default=100, help='requests per second per noisy user')
+    parser.add_argument('--normal-users', type=int, default=200)
+    parser.add_argument('--normal-rate', type=float, default=0.2, help='requests per second per normal user')
+    parser.add_argument('--nat-users', type=int, default=40, help='normal users sharing one source address')
+    parser.add_argument('--payload-format', choices=['1.0', '2.0'], default='1.0',
+                        help='API Gateway event layout, 1.0 is what the integrations use')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    start = 1_699_999_980  # Aligned to a window boundary
+    clock = Clock(start)
+    table = SharedCounterTable()
+    containers = [throttle.RateLimiter(table=table, clock=clock) for _ in range(args.containers)]
+
+    offered = defaultdict(int)
+    admitted = defaultdict(int)
+    window_cost = defaultdict(int)
+    kms_calls = defaultdict(int)
+
+    requests = build_schedule(args, rng)
+    # admit logs every throttled request
+    with open(os.devnull, 'w') as sink, contextlib.redirect_stdout(sink):
+        for t, client, user_id, source_ip, route in requests:
+            clock.now = start + t
+            offered[client] += 1
+            throttle._limiter = rng.choice(containers)
+            if throttle.admit(make_event(source_ip, args.payload_format), user_id, route) is None:
+                admitted[client] += 1
+                window_cost[client, int(clock.now // throttle.WINDOW_SECONDS)] += throttle.ROUTE_COSTS[route]
+                if route in ('generate_data_key', 'decrypt_data_key'):
+                    kms_calls[client] += 1
+
+    classes = {name: [c for c in offered if c.startswith(f'{name}-')] for name in ('noisy', 'rotating', 'spoofing')}
+    classes['normal'] = [c for c in offered if c.startswith('user-')]
+    peak_window_cost = defaultdict(int)
+    for (client, _), cost in window_cost.items():
+        peak_window_cost[client] = max(peak_window_cost[client], cost)
+
+    print(f"{len(requests)} requests over {args.seconds}s across {args.containers} containers, payload format {args.payload_format}\n")
+    print(f"{'class':<10}{'clients':>8}{'offered':>10}{'admitted':>10}{'shed %':>9}{'KMS calls':>11}{'peak tokens/window':>20}")
+    for name, clients in classes.items():
+        total_offered = sum(offered[c] for c in clients)
+        total_admitted = sum(admitted[c] for c in clients)
+        shed = 100 * (1 - total_admitted / total_offered) if total_offered else 0
+        total_kms = sum(kms_calls[c] for c in clients)
+        peak = max((peak_window_cost[c] for c in clients), default=0)
+        print(f"{name:<10}{len(clients):>8}{total_offered:>10}{total_admitted:>10}{shed:>9.1f}{total_kms:>11}{peak:>20}")
+
+    normal_ratio = [admitted[c] / offered[c] for c in classes['normal']]
+    print(f"\nDynamoDB counter updates: {table.update_calls} ({table.update_calls / len(requests):.3f} per request)")
+    print(f"Jain fairness of admitted/offered across normal users: {jain_index(normal_ratio):.4f}")
+
+    # Fairness holds when normal users, including the one being impersonated and those behind NAT,
+    # are untouched and every attacker stays within the budget of the bucket that limits it
+    worst_normal = min(normal_ratio, default=1.0)
+    # Unsynced spend lets each container overshoot by up to one sync batch
+    overshoot = args.containers * (throttle.SYNC_BATCH_COST + max(throttle.ROUTE_COSTS.values()))
+    allowed = {
+        'noisy': throttle.WINDOW_BUDGET + overshoot,
+        'spoofing': throttle.WINDOW_BUDGET + overshoot,
+        'rotating': throttle.WINDOW_BUDGET * throttle.ADDRESS_SCALE + overshoot
+    }
+    budget_ok = True
+    for name, limit in allowed.items():
+        peak = max(peak_window_cost[c] for c in classes[name])
+        budget_ok = budget_ok and peak <= limit
+        print(f"{name.capitalize()} peak window spend: {peak} tokens (allowed {limit})")
+    print(f"Impersonated user-0 admitted: {100 * admitted['user-0'] / offered['user-0']:.1f}%")
+    print(f"Worst normal user admitted: {100 * worst_normal:.1f}%")
+    if worst_normal < 0.99 or not budget_ok:
+        print("FAIL: fairness not held")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
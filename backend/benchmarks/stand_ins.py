@@ -0,0 +1,322 @@
+"""In-process stand-ins for the DynamoDB, S3, KMS and Lambda calls the handlers make.
+
+They keep state in dicts, hand back numbers as Decimals like boto3 does and
+count every call, so a benchmark measures the handler's own work plus how
+many AWS round trips it would have made. Presigned URLs are still signed by a
+real botocore client with dummy credentials, since that is local CPU work the
+handlers really do.
+"""
+import io
+import os
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from decimal import Decimal
+from unittest import mock
+
+import boto3
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
+
+_serializer = TypeSerializer()
+QUERY_PAGE_BYTES = 1024 * 1024  # DynamoDB stops each Query page after reading 1 MB
+_calls_lock = threading.Lock()  # archive.py calls S3 from worker threads
+
+
+def _count(calls, operation):
+    with _calls_lock:
+        calls[operation] += 1
+
+
+def _to_dynamodb(value):
+    # boto3 stores ints and floats as Decimal and returns them that way
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {k: _to_dynamodb(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_to_dynamodb(v) for v in value]
+    return value
+
+
+def _item_size(value):
+    # DynamoDB's item size rules: UTF-8 lengths for names and strings, about one byte per two digits for numbers
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, bool) or value is None:
+        return 1
+    if isinstance(value, Decimal):
+        digits = value.as_tuple().digits
+        return (len(digits) + 1) // 2 + 1
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return 3 + sum(len(k.encode('utf-8')) + _item_size(v) + 1 for k, v in value.items())
+    if isinstance(value, (list, set)):
+        return 3 + sum(_item_size(v) + 1 for v in value)
+    raise TypeError(type(value).__name__)
+
+
+def _client_error(code, operation, item=None):
+    response = {'Error': {'Code': code, 'Message': code}}
+    if item is not None:
+        response['Item'] = {k: _serializer.serialize(v) for k, v in item.items()}
+    return ClientError(response, operation)
+
+
+class FakeTable:
+    def __init__(self, name, key, calls, indexes=None):
+        self.name = name
+        self.key = key
+        self.calls = calls
+        self.items = {}
+        self.indexes = indexes or {}  # index name -> attribute, items kept grouped by it
+        self._index_items = {index: {} for index in self.indexes}
+
+    def _store(self, item):
+        old = self.items.get(item[self.key])
+        for index, attribute in self.indexes.items():
+            if old is not None:
+                self._index_items[index].get(old.get(attribute), {}).pop(old[self.key], None)
+            if attribute in item:
+                self._index_items[index].setdefault(item[attribute], {})[item[self.key]] = item
+        self.items[item[self.key]] = item
+
+    def seed(self, item):
+        self._store(_to_dynamodb(item))
+
+    def get_item(self, Key, ProjectionExpression=None, ConsistentRead=False):
+        _count(self.calls, 'dynamodb.GetItem')
+        item = self.items.get(Key[self.key])
+        if item is None:
+            return {}
+        if ProjectionExpression:
+            names = [name.strip() for name in ProjectionExpression.split(',')]
+            return {'Item': {name: item[name] for name in names if name in item}}
+        return {'Item': dict(item)}
+
+    def put_item(self, Item):
+        _count(self.calls, 'dynamodb.PutItem')
+        self._store(_to_dynamodb(Item))
+        return {}
+
+    def delete_item(self, Key):
+        _count(self.calls, 'dynamodb.DeleteItem')
+        item = self.items.pop(Key[self.key], None)
+        if item is not None:
+            for index, attribute in self.indexes.items():
+                self._index_items[index].get(item.get(attribute), {}).pop(item[self.key], None)
+        return {}
+
+    def query(self, IndexName, KeyConditionExpression, ExclusiveStartKey=None):
+        _count(self.calls, 'dynamodb.Query')
+        _, value = KeyConditionExpression.get_expression()['values']
+        matches = list(self._index_items[IndexName].get(value, {}).values())
+        start = 0
+        if ExclusiveStartKey:
+            start = next(i for i, item in enumerate(matches) if item[self.key] == ExclusiveStartKey[self.key]) + 1
+
+        # Pages stop at QUERY_PAGE_BYTES of items, like the real service
+        page = []
+        read = 0
+        for item in matches[start:]:
+            size = sum(len(name.encode('utf-8')) + _item_size(v) for name, v in item.items())
+            if page and read + size > QUERY_PAGE_BYTES:
+                break
+            read += size
+            page.append(dict(item))
+
+        response = {'Items': page, 'Count': len(page)}
+        if start + len(page) < len(matches):
+            last = page[-1]
+            response['LastEvaluatedKey'] = {self.key: last[self.key], self.indexes[IndexName]: last[self.indexes[IndexName]]}
+        return response
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues, ExpressionAttributeNames=None,
+                    ConditionExpression=None, ReturnValues='NONE', ReturnValuesOnConditionCheckFailure='NONE'):
+        _count(self.calls, 'dynamodb.UpdateItem')
+        names = ExpressionAttributeNames or {}
+        values = _to_dynamodb(ExpressionAttributeValues)
+        current = self.items.get(Key[self.key])
+        item = dict(current) if current else dict(Key)
+
+        def resolve(name):
+            return names.get(name, name)
+
+        if ConditionExpression and not self._condition(ConditionExpression, item if current else {}, resolve, values):
+            old = current if ReturnValuesOnConditionCheckFailure == 'ALL_OLD' else None
+            raise _client_error('ConditionalCheckFailedException', 'UpdateItem', old)
+
+        updated = {}
+        for clause, body in re.findall(r'(SET|ADD)\s+(.*?)(?=\s+(?:SET|ADD)\s+|$)', UpdateExpression):
+            # Commas inside function calls like if_not_exists(a, :b) don't separate actions
+            for action in re.split(r',(?![^(]*\))', body):
+                if clause == 'SET':
+                    target, expression = [part.strip() for part in action.split('=', 1)]
+                    match = re.match(r'if_not_exists\((\S+),\s*(\S+)\)', expression)
+                    if match:
+                        existing = item.get(resolve(match.group(1)))
+                        value = existing if existing is not None else values[match.group(2)]
+                    else:
+                        value = values[expression]
+                else:
+                    target, placeholder = action.split()
+                    value = item.get(resolve(target), Decimal(0)) + values[placeholder]
+                item[resolve(target)] = value
+                updated[resolve(target)] = value
+
+        self._store(item)
+        if ReturnValues == 'UPDATED_NEW':
+            return {'Attributes': updated}
+        return {}
+
+    @staticmethod
+    def _condition(expression, item, resolve, values):
+        # Only the OR-of-terms conditions the handlers build are supported
+        for term in expression.split(' OR '):
+            term = term.strip()
+            match = re.match(r'attribute_not_exists\((\S+)\)$', term)
+            if match:
+                if resolve(match.group(1)) not in item:
+                    return True
+                continue
+            name, operator, placeholder = term.split()
+            if operator != '<>':
+                raise NotImplementedError(term)
+            attribute = resolve(name)
+            if attribute in item and item[attribute] != values[placeholder]:
+                return True
+        return False
+
+
+class FakeDynamoDB:
+    def __init__(self, tables, calls):
+        self.tables = tables
+        self.calls = calls
+
+    def Table(self, name):
+        return self.tables[name]
+
+    def batch_get_item(self, RequestItems):
+        _count(self.calls, 'dynamodb.BatchGetItem')
+        responses = {}
+        for name, request in RequestItems.items():
+            table = self.tables[name]
+            responses[name] = [dict(table.items[key[table.key]]) for key in request['Keys'] if key[table.key] in table.items]
+        return {'Responses': responses, 'UnprocessedKeys': {}}
+
+
+class FakeS3:
+    def __init__(self, calls):
+        self.calls = calls
+        self.objects = {}
+        self.uploads = {}
+        self._signer = boto3.session.Session(
+            aws_access_key_id='AKIABENCHMARK', aws_secret_access_key='benchmark', region_name='eu-central-1'
+        ).client('s3')
+
+    def generate_presigned_url(self, ClientMethod, Params=None, ExpiresIn=3600):
+        _count(self.calls, 's3.GeneratePresignedUrl')
+        return self._signer.generate_presigned_url(ClientMethod, Params=Params, ExpiresIn=ExpiresIn)
+
+    def get_object(self, Bucket, Key):
+        _count(self.calls, 's3.GetObject')
+        try:
+            data = self.objects[Key]
+        except KeyError:
+            raise _client_error('NoSuchKey', 'GetObject')
+        return {'ContentLength': len(data), 'Body': io.BytesIO(data)}
+
+    def put_object(self, Bucket, Key, Body, ContentType=None):
+        _count(self.calls, 's3.PutObject')
+        self.objects[Key] = bytes(Body)
+        return {}
+
+    def delete_object(self, Bucket, Key):
+        _count(self.calls, 's3.DeleteObject')
+        self.objects.pop(Key, None)
+        return {}
+
+    def create_multipart_upload(self, Bucket, Key, ContentType=None):
+        _count(self.calls, 's3.CreateMultipartUpload')
+        upload_id = f"upload-{len(self.uploads)}"
+        self.uploads[upload_id] = {}
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        _count(self.calls, 's3.UploadPart')
+        # Only the size is kept, archives are discarded
+        self.uploads[UploadId][PartNumber] = len(Body)
+        return {'ETag': f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        _count(self.calls, 's3.CompleteMultipartUpload')
+        self.uploads.pop(UploadId, None)
+        return {}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        _count(self.calls, 's3.AbortMultipartUpload')
+        self.uploads.pop(UploadId, None)
+        return {}
+
+
+class FakeKMS:
+    KEY_ARN = 'arn:aws:kms:eu-central-1:000000000000:key/00000000-0000-0000-0000-000000000000'
+
+    def __init__(self, calls):
+        self.calls = calls
+
+    def generate_data_key(self, KeyId, KeySpec, EncryptionContext):
+        _count(self.calls, 'kms.GenerateDataKey')
+        return {'Plaintext': os.urandom(32), 'CiphertextBlob': os.urandom(184), 'KeyId': self.KEY_ARN}
+
+    def decrypt(self, CiphertextBlob, EncryptionContext):
+        _count(self.calls, 'kms.Decrypt')
+        return {'Plaintext': os.urandom(32), 'KeyId': self.KEY_ARN}
+
+
+class FakeLambda:
+    """Records asynchronous invocations without running them."""
+
+    def __init__(self, calls):
+        self.calls = calls
+        self.invocations = []
+
+    def invoke(self, FunctionName, InvocationType, Payload):
+        _count(self.calls, 'lambda.Invoke')
+        self.invocations.append((FunctionName, Payload))
+        return {'StatusCode': 202}
+
+
+class FakeAWS:
+    """One set of tables, buckets and keys shared by every handler."""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.tables = {
+            'secdrive_users': FakeTable('secdrive_users', 'user_id', self.calls),
+            'secdrive_user_files': FakeTable('secdrive_user_files', 'file_id', self.calls,
+                                             indexes={'secdrive_user_id_index': 'user_id'}),
+            'secdrive_rate_limits': FakeTable('secdrive_rate_limits', 'limit_key', self.calls)
+        }
+        self.dynamodb = FakeDynamoDB(self.tables, self.calls)
+        self.s3 = FakeS3(self.calls)
+        self.kms = FakeKMS(self.calls)
+        self.lambda_ = FakeLambda(self.calls)
+
+    def resource(self, service_name, *args, **kwargs):
+        if service_name != 'dynamodb':
+            raise NotImplementedError(service_name)
+        return self.dynamodb
+
+    def client(self, service_name, *args, **kwargs):
+        return {'s3': self.s3, 'kms': self.kms, 'lambda': self.lambda_}[service_name]
+
+    @contextmanager
+    def patched(self):
+        """Route boto3.resource and boto3.client to the stand-ins."""
+        with mock.patch('boto3.resource', new=self.resource), mock.patch('boto3.client', new=self.client):
+            yield self
@@ -0,0 +1,68 @@
+"""Synthetic users and file metadata for the handler benchmarks.
+
+Items have the same shape confirm_upload and store_user_data write, and a
+fixed seed makes every run produce the same data.
+"""
+import base64
+import random
+import uuid
+from datetime import datetime, timedelta
+
+EXTENSIONS = ['pdf', 'docx', 'xlsx', 'png', 'jpg', 'txt', 'zip', 'mp4', 'csv', 'pptx']
+CONTENT_TYPES = {
+    'pdf': 'application/pdf', 'png': 'image/png', 'jpg': 'image/jpeg', 'txt': 'text/plain',
+    'zip': 'application/zip', 'mp4': 'video/mp4', 'csv': 'text/csv'
+}
+
+
+def make_user(rng, user_id):
+    return {
+        'user_id': user_id,
+        'email': f'{user_id}@example.com',
+        'first_name': rng.choice(['Ana', 'Luka', 'Mia', 'Ivan', 'Sara', 'Marko']),
+        'last_name': rng.choice(['Horvat', 'Kovac', 'Babic', 'Maric', 'Juric']),
+        'profile_version': 1
+    }
+
+
+def make_file(rng, user_id, index, object_size=None):
+    file_id = str(uuid.UUID(int=rng.getrandbits(128)))
+    extension = rng.choice(EXTENSIONS)
+    file_name = f'file_{index}.{extension}'
+    # Log-uniform sizes from a few bytes to a few GiB
+    file_size = object_size if object_size is not None else int(10 ** rng.uniform(1, 9.5))
+    uploaded = datetime(2025, 1, 1) + timedelta(seconds=rng.randrange(365 * 24 * 3600))
+    item = {
+        'file_id': file_id,
+        'user_id': user_id,
+        'file_name': file_name,
+        'file_size': file_size,
+        's3_key': f'{user_id}/{file_id}_{file_name}',
+        'content_type': CONTENT_TYPES.get(extension, 'application/octet-stream'),
+        'extension': extension,
+        'upload_date': uploaded.isoformat(),
+        'is_folder': False
+    }
+    # Most files are encrypted, a few legacy uploads are not
+    if rng.random() < 0.95:
+        item['encrypted_key'] = base64.b64encode(rng.randbytes(184)).decode('utf-8')
+        item['is_encrypted'] = True
+    else:
+        item['is_encrypted'] = False
+    return item
+
+
+def seed_user(aws, rng, user_id, file_count, object_size=None):
+    """Store a user and file_count files in the stand-in tables, returning the file items.
+
+    With object_size set, each file also gets an S3 object of that many bytes.
+    """
+    aws.tables['secdrive_users'].seed(make_user(rng, user_id))
+    files = []
+    for index in range(file_count):
+        item = make_file(rng, user_id, index, object_size)
+        aws.tables['secdrive_user_files'].seed(item)
+        if object_size is not None:
+            aws.s3.objects[item['s3_key']] = rng.randbytes(object_size)
+        files.append(item)
+    return files
@@ -0,0 +1,101 @@
+import boto3
+from botocore.exceptions import ClientError
+from datetime import datetime
+from archive import iter_zip, iter_s3_objects, MultipartWriter, archive_keys, archive_names, get_file_items, put_status
+from responses import dumps
+
+# Every byte is downloaded and uploaded again, at roughly 50-90 MiB/s each way on Lambda.
+# At that rate the cap takes a few minutes, well inside the 15 minute build timeout.
+MAX_ARCHIVE_BYTES = 10 * 1024 * 1024 * 1024  # 10 GiB
+DEADLINE_MARGIN_MS = 10000  # Time kept back to abort the upload and record the failure
+
+class _ArchiveFailed(Exception):
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+
+def _build(dynamodb, s3_client, bucket_name, context, user_id, file_ids, archive_key):
+    # download_archive already checked the request, but files may have changed since
+    found = get_file_items(dynamodb, file_ids)
+    missing = [file_id for file_id in file_ids if file_id not in found]
+    if missing:
+        raise _ArchiveFailed(404, f'Files not found: {", ".join(missing[:10])}')
+
+    items = [found[file_id] for file_id in file_ids]
+    if any(item.get('user_id') != user_id for item in items):
+        raise _ArchiveFailed(403, 'Unauthorized: File does not belong to user')
+
+    names = archive_names(items)
+
+    # The manifest carries the encrypted data keys so the client can decrypt each entry
+    manifest = dumps({
+        'created': datetime.utcnow().isoformat(),
+        'files': [{
+            'file_id': item['file_id'],
+            'path': name,
+            'name': item.get('file_name'),
+            'content_type': item.get('content_type', 'application/octet-stream'),
+            'is_encrypted': item.get('is_encrypted', False),
+            'encrypted_key': item.get('encrypted_key') if item.get('is_encrypted', False) else None
+        } for item, name in zip(items, names)]
+    }).encode('utf-8')
+
+    def entries():
+        yield 'manifest.json', len(manifest), [manifest]
+        total = 0
+        objects = iter_s3_objects(s3_client, bucket_name, [item['s3_key'] for item in items])
+        for name, (_, size, chunks) in zip(names, objects):
+            # file_size comes from the client, so the cap is enforced on what S3 actually holds
+            total += size
+            if total > MAX_ARCHIVE_BYTES:
+                raise _ArchiveFailed(413, 'Selected files are too large to archive, download them individually')
+            yield name, size, chunks
+
+    # Stream the archive straight into a multipart upload, memory stays bounded and nothing touches disk
+    writer = MultipartWriter(s3_client, bucket_name, archive_key)
+    try:
+        for chunk in iter_zip(entries()):
+            # Stop before Lambda kills the function, so the failure can still be recorded
+            if context is not None and context.get_remaining_time_in_millis() < DEADLINE_MARGIN_MS:
+                raise _ArchiveFailed(504, 'Selected files took too long to archive, select fewer files')
+            writer.write(chunk)
+        writer.close()
+    except Exception:
+        writer.abort()
+        raise
+
+    return {
+        'status': 'ready',
+        'file_count': len(items),
+        'archive_size': writer.size,
+        'created': datetime.utcnow().isoformat()
+    }
+
+def lambda_handler(event, context):
+    """Build an archive requested through download_archive, invoked asynchronously.
+
+    The outcome is written to the archive's status object, which
+    download_archive reads when the client polls.
+    """
+    dynamodb = boto3.resource('dynamodb')
+    s3_client = boto3.client('s3')
+    bucket_name = 'secdrive-user-files-nknez'
+
+    user_id = event['user_id']
+    archive_key, status_key = archive_keys(user_id, event['archive_id'])
+
+    # Errors are recorded rather than raised, a retried invocation would only fail the same way
+    try:
+        status = _build(dynamodb, s3_client, bucket_name, context, user_id, event['file_ids'], archive_key)
+    except _ArchiveFailed as e:
+        print(f"Archive {archive_key} failed: {str(e)}")
+        status = {'status': 'failed', 'status_code': e.status_code, 'error': str(e)}
+    except ClientError as e:
+        print(f"AWS ClientError: {str(e)}")
+        status = {'status': 'failed', 'status_code': 500, 'error': f'AWS Error: {str(e)}'}
+    except Exception as e:
+        print(f"Unexpected error: {str(e)}")
+        status = {'status': 'failed', 'status_code': 500, 'error': f'Unexpected error: {str(e)}'}
+
+    put_status(s3_client, bucket_name, status_key, status)
+    return status
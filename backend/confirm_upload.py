@@ -2,6 +2,8 @@ import json
 import boto3
 from botocore.exceptions import ClientError
 from datetime import datetime
+from responses import json_response, error_response
+from throttle import admit
 
 def lambda_handler(event, context):
     dynamodb = boto3.resource('dynamodb')
@@ -24,17 +26,12 @@ def lambda_handler(event, context):
         file_extension = file_name.split('.')[-1] if '.' in file_name else ''
         
         if not all([file_id, user_id, file_name, file_size, s3_key]):
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type',
-                    'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-                },
-                'body': json.dumps({
-                    'error': 'file_id, user_id, file_name, file_size, and s3_key are required'
-                })
-            }
+            return error_response(400, 'file_id, user_id, file_name, file_size, and s3_key are required')
+
+        # Charge the user's rate limit before any AWS call
+        throttled = admit(event, user_id, 'confirm_upload')
+        if throttled:
+            return throttled
         
         # Create timestamp
         timestamp = datetime.utcnow().isoformat()
@@ -61,50 +58,18 @@ def lambda_handler(event, context):
             
         response = table.put_item(Item=item)
         
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-            },
-            'body': json.dumps({
-                'message': 'File metadata stored successfully',
-                'file_id': file_id
-            })
-        }
+        return json_response(200, {
+            'message': 'File metadata stored successfully',
+            'file_id': file_id
+        })
         
     except ClientError as e:
         print(f"DynamoDB ClientError: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-            },
-            'body': json.dumps({'error': f'Database Error: {str(e)}'})
-        }
+        return error_response(500, f'Database Error: {str(e)}')
     
     except json.JSONDecodeError:
-        return {
-            'statusCode': 400,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-            },
-            'body': json.dumps({'error': 'Invalid JSON in request body'})
-        }
+        return error_response(400, 'Invalid JSON in request body')
     
     except Exception as e:
         print(f"Unexpected error: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-            },
-            'body': json.dumps({'error': f'Unexpected error: {str(e)}'})
-        }
+        return error_response(500, f'Unexpected error: {str(e)}')
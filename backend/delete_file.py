@@ -1,6 +1,8 @@
 import json
 import boto3
 from botocore.exceptions import ClientError
+from responses import json_response, error_response
+from throttle import admit
 
 def lambda_handler(event, context):
     dynamodb = boto3.resource('dynamodb')
@@ -17,15 +19,12 @@ def lambda_handler(event, context):
         user_id = body.get('user_id')
         
         if not file_id or not user_id:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type',
-                    'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-                },
-                'body': json.dumps({'error': 'file_id and user_id are required'})
-            }
+            return error_response(400, 'file_id and user_id are required')
+
+        # Charge the user's rate limit before any AWS call
+        throttled = admit(event, user_id, 'delete_file')
+        if throttled:
+            return throttled
         
         # First, get the file metadata to retrieve the S3 key
         try:
@@ -34,44 +33,20 @@ def lambda_handler(event, context):
             )
             
             if 'Item' not in file_response:
-                return {
-                    'statusCode': 404,
-                    'headers': {
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type',
-                        'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-                    },
-                    'body': json.dumps({'error': 'File not found'})
-                }
+                return error_response(404, 'File not found')
             
             file_item = file_response['Item']
             
             # Verify the file belongs to the user
             if file_item.get('user_id') != user_id:
-                return {
-                    'statusCode': 403,
-                    'headers': {
-                        'Access-Control-Allow-Origin': '*',
-                        'Access-Control-Allow-Headers': 'Content-Type',
-                        'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-                    },
-                    'body': json.dumps({'error': 'Unauthorized: File does not belong to user'})
-                }
+                return error_response(403, 'Unauthorized: File does not belong to user')
             
             s3_key = file_item.get('s3_key')
             file_name = file_item.get('file_name', 'unknown')
             
         except ClientError as e:
             print(f"Error getting file metadata: {str(e)}")
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type',
-                    'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-                },
-                'body': json.dumps({'error': 'Failed to retrieve file metadata'})
-            }
+            return error_response(500, 'Failed to retrieve file metadata')
         
         # Delete the file from S3
         if s3_key:
@@ -94,49 +69,17 @@ def lambda_handler(event, context):
             print(f"Successfully deleted file metadata for file_id: {file_id}")
         except ClientError as e:
             print(f"Error deleting file metadata: {str(e)}")
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type',
-                    'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-                },
-                'body': json.dumps({'error': 'Failed to delete file metadata'})
-            }
+            return error_response(500, 'Failed to delete file metadata')
         
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-            },
-            'body': json.dumps({
-                'message': f'File "{file_name}" deleted successfully',
-                'file_id': file_id,
-                's3_key': s3_key
-            })
-        }
+        return json_response(200, {
+            'message': f'File "{file_name}" deleted successfully',
+            'file_id': file_id,
+            's3_key': s3_key
+        })
         
     except json.JSONDecodeError:
-        return {
-            'statusCode': 400,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-            },
-            'body': json.dumps({'error': 'Invalid JSON in request body'})
-        }
+        return error_response(400, 'Invalid JSON in request body')
     
     except Exception as e:
         print(f"Unexpected error: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-            },
-            'body': json.dumps({'error': f'Unexpected error: {str(e)}'})
-        }
+        return error_response(500, f'Unexpected error: {str(e)}')
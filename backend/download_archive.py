@@ -0,0 +1,136 @@
+import json
+import uuid
+import boto3
+from botocore.exceptions import ClientError
+from datetime import datetime
+from archive import archive_keys, get_file_items, put_status
+from build_archive import MAX_ARCHIVE_BYTES
+from responses import dumps, json_response, error_response
+from throttle import admit
+
+MAX_ARCHIVE_FILES = 1000
+BUILD_FUNCTION = 'build_archive'
+
+def _archive_status(event, s3_client, bucket_name):
+    # Polled by the client until the archive built by build_archive is ready
+    query = event.get('queryStringParameters') or {}
+    user_id = query.get('user_id')
+    archive_id = query.get('archive_id')
+
+    if not user_id:
+        return error_response(400, 'user_id and archive_id are required')
+    try:
+        archive_id = str(uuid.UUID(archive_id))
+    except (TypeError, ValueError):
+        return error_response(400, 'archive_id must be a UUID')
+
+    # Charge the user's rate limit before any AWS call
+    throttled = admit(event, user_id, 'download_archive_status')
+    if throttled:
+        return throttled
+
+    archive_key, status_key = archive_keys(user_id, archive_id)
+    try:
+        status = json.loads(s3_client.get_object(Bucket=bucket_name, Key=status_key)['Body'].read())
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'NoSuchKey':
+            raise
+        return error_response(404, 'Archive not found')
+
+    if status['status'] == 'building':
+        return json_response(202, {'archive_id': archive_id, 'status': 'building'})
+    if status['status'] == 'failed':
+        return error_response(status['status_code'], status['error'])
+
+    download_url = s3_client.generate_presigned_url(
+        'get_object',
+        Params={
+            'Bucket': bucket_name,
+            'Key': archive_key,
+            'ResponseContentDisposition': f'attachment; filename="secdrive-{datetime.fromisoformat(status["created"]):%Y%m%d-%H%M%S}.zip"'
+        },
+        ExpiresIn=3600  # 1 hour
+    )
+
+    return json_response(200, {
+        'archive_id': archive_id,
+        'status': 'ready',
+        'url': download_url,
+        'file_count': status['file_count'],
+        'archive_size': status['archive_size']
+    })
+
+def lambda_handler(event, context):
+    dynamodb = boto3.resource('dynamodb')
+    s3_client = boto3.client('s3')
+    lambda_client = boto3.client('lambda')
+    bucket_name = 'secdrive-user-files-nknez'
+
+    try:
+        # GET polls an archive that is being built, POST starts a new one
+        if (event.get('queryStringParameters') or {}).get('archive_id'):
+            return _archive_status(event, s3_client, bucket_name)
+
+        # Parse the request body
+        body = json.loads(event['body'])
+        user_id = body.get('user_id')
+        file_ids = body.get('file_ids')
+
+        if not user_id or not file_ids or not isinstance(file_ids, list) or not all(isinstance(file_id, str) for file_id in file_ids):
+            return error_response(400, 'user_id and a list of file_ids are required')
+
+        # Keep the requested order but drop duplicates
+        file_ids = list(dict.fromkeys(file_ids))
+        if len(file_ids) > MAX_ARCHIVE_FILES:
+            return error_response(400, f'At most {MAX_ARCHIVE_FILES} files can be archived at once')
+
+        # Charge the user's rate limit before any AWS call
+        throttled = admit(event, user_id, 'download_archive')
+        if throttled:
+            return throttled
+
+        found = get_file_items(dynamodb, file_ids)
+        missing = [file_id for file_id in file_ids if file_id not in found]
+        if missing:
+            return error_response(404, f'Files not found: {", ".join(missing[:10])}')
+
+        items = [found[file_id] for file_id in file_ids]
+
+        # Verify every file belongs to the user
+        if any(item.get('user_id') != user_id for item in items):
+            return error_response(403, 'Unauthorized: File does not belong to user')
+
+        # Early rejection only, file_size is client supplied and build_archive checks the real sizes
+        if sum(int(item.get('file_size', 0)) for item in items) > MAX_ARCHIVE_BYTES:
+            return error_response(413, 'Selected files are too large to archive, download them individually')
+
+        # Building a multi-GB archive takes minutes, far past the API Gateway timeout, so it runs asynchronously
+        archive_id = str(uuid.uuid4())
+        _, status_key = archive_keys(user_id, archive_id)
+        put_status(s3_client, bucket_name, status_key, {'status': 'building'})
+        lambda_client.invoke(
+            FunctionName=BUILD_FUNCTION,
+            InvocationType='Event',
+            Payload=dumps({
+                'user_id': user_id,
+                'archive_id': archive_id,
+                'file_ids': file_ids
+            }).encode('utf-8')
+        )
+
+        return json_response(202, {
+            'archive_id': archive_id,
+            'status': 'building',
+            'file_count': len(items)
+        })
+
+    except ClientError as e:
+        print(f"AWS ClientError: {str(e)}")
+        return error_response(500, f'AWS Error: {str(e)}')
+
+    except json.JSONDecodeError:
+        return error_response(400, 'Invalid JSON in request body')
+
+    except Exception as e:
+        print(f"Unexpected error: {str(e)}")
+        return error_response(500, f'Unexpected error: {str(e)}')
@@ -2,6 +2,8 @@ import json
 import boto3
 import base64
 from botocore.exceptions import ClientError
+from responses import json_response, error_response
+from throttle import admit
 
 def lambda_handler(event, context):
     kms_client = boto3.client('kms')
@@ -13,15 +15,12 @@ def lambda_handler(event, context):
         user_id = body.get('user_id')
         
         if not user_id:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type',
-                    'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-                },
-                'body': json.dumps({'error': 'user_id is required'})
-            }
+            return error_response(400, 'user_id is required')
+
+        # Charge the user's rate limit before any AWS call
+        throttled = admit(event, user_id, 'generate_data_key')
+        if throttled:
+            return throttled
         
         # Generate a data key for client-side encryption
         # The plaintext key will be used client-side, encrypted key stored with metadata
@@ -42,51 +41,19 @@ def lambda_handler(event, context):
         plaintext_key_b64 = base64.b64encode(plaintext_key).decode('utf-8')
         encrypted_key_b64 = base64.b64encode(encrypted_key).decode('utf-8')
         
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-            },
-            'body': json.dumps({
-                'plaintext_key': plaintext_key_b64,
-                'encrypted_key': encrypted_key_b64,
-                'key_id': response['KeyId']
-            })
-        }
+        return json_response(200, {
+            'plaintext_key': plaintext_key_b64,
+            'encrypted_key': encrypted_key_b64,
+            'key_id': response['KeyId']
+        })
         
     except ClientError as e:
         print(f"KMS ClientError: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-            },
-            'body': json.dumps({'error': f'KMS Error: {str(e)}'})
-        }
+        return error_response(500, f'KMS Error: {str(e)}')
     
     except json.JSONDecodeError:
-        return {
-            'statusCode': 400,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-            },
-            'body': json.dumps({'error': 'Invalid JSON in request body'})
-        }
+        return error_response(400, 'Invalid JSON in request body')
     
     except Exception as e:
         print(f"Unexpected error: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-            },
-            'body': json.dumps({'error': f'Unexpected error: {str(e)}'})
-        }
+        return error_response(500, f'Unexpected error: {str(e)}')
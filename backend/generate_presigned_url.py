@@ -3,6 +3,8 @@ import boto3
 from botocore.exceptions import ClientError
 import uuid
 from datetime import datetime
+from responses import json_response, error_response
+from throttle import admit
 
 def lambda_handler(event, context):
     s3_client = boto3.client('s3')
@@ -17,15 +19,12 @@ def lambda_handler(event, context):
         content_type = body.get('content_type', 'application/octet-stream')
         
         if not user_id or not file_name:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type',
-                    'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-                },
-                'body': json.dumps({'error': 'user_id and file_name are required'})
-            }
+            return error_response(400, 'user_id and file_name are required')
+
+        # Charge the user's rate limit before any AWS call
+        throttled = admit(event, user_id, 'generate_presigned_url')
+        if throttled:
+            return throttled
         
         # Generate unique file ID and S3 key
         file_id = str(uuid.uuid4())
@@ -42,52 +41,20 @@ def lambda_handler(event, context):
             ExpiresIn=3600  # URL expires in 1 hour
         )
         
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-            },
-            'body': json.dumps({
-                'presigned_url': presigned_url,
-                'file_id': file_id,
-                's3_key': s3_key,
-                'bucket_name': bucket_name
-            })
-        }
+        return json_response(200, {
+            'presigned_url': presigned_url,
+            'file_id': file_id,
+            's3_key': s3_key,
+            'bucket_name': bucket_name
+        })
         
     except ClientError as e:
         print(f"AWS ClientError: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-            },
-            'body': json.dumps({'error': f'AWS Error: {str(e)}'})
-        }
+        return error_response(500, f'AWS Error: {str(e)}')
     
     except json.JSONDecodeError:
-        return {
-            'statusCode': 400,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-            },
-            'body': json.dumps({'error': 'Invalid JSON in request body'})
-        }
+        return error_response(400, 'Invalid JSON in request body')
     
     except Exception as e:
         print(f"Unexpected error: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-            },
-            'body': json.dumps({'error': f'Unexpected error: {str(e)}'})
-        }
+        return error_response(500, f'Unexpected error: {str(e)}')
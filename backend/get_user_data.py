@@ -1,7 +1,8 @@
-import simplejson as json
 import boto3
 from botocore.exceptions import ClientError
 from datetime import datetime
+from responses import json_response, error_response
+from throttle import admit
 
 def lambda_handler(event, context):
     dynamodb = boto3.resource('dynamodb')
@@ -10,6 +11,11 @@ def lambda_handler(event, context):
     
     try:
         user_id = event['queryStringParameters']['user_id']
+
+        # Charge the user's rate limit before any AWS call
+        throttled = admit(event, user_id, 'get_user_data')
+        if throttled:
+            return throttled
         
         # Query user files from DynamoDB
         response = files_table.query(
@@ -67,39 +73,16 @@ def lambda_handler(event, context):
                 'encryptedKey': item.get('encrypted_key') if item.get('is_encrypted', False) else None
             })
         
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-            },
-            'body': json.dumps({
-                'files': files,
-                'total_files': len(files)
-            })
-        }
+        # Large listings are compressed when the client accepts it
+        return json_response(200, {
+            'files': files,
+            'total_files': len(files)
+        }, event)
         
     except ClientError as e:
         print("ClientError:", str(e))
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-            },
-            'body': json.dumps({'error': str(e)})
-        }
+        return error_response(500, str(e))
     
     except Exception as e:
         print("Exception:", str(e))
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-            },
-            'body': json.dumps({'error': str(e)})
-        }
\ No newline at end of file
+        return error_response(500, str(e))
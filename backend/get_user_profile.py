@@ -1,68 +1,79 @@
-import simplejson as json
+import time
 import boto3
 from botocore.exceptions import ClientError
+from responses import json_response, error_response
+from throttle import admit
+
+# Profiles cached per container, keyed by user_id: (checked_at, profile_version, profile)
+PROFILE_CACHE_TTL = 60  # Seconds a cached profile is served before it is read again
+PROFILE_CACHE_MAX_ENTRIES = 1024
+_profile_cache = {}
+
+def _cache_put(user_id, profile_version, profile):
+    _profile_cache.pop(user_id, None)
+    if len(_profile_cache) >= PROFILE_CACHE_MAX_ENTRIES:
+        # Dicts keep insertion order, so the first key is the least recently stored
+        del _profile_cache[next(iter(_profile_cache))]
+    _profile_cache[user_id] = (time.monotonic(), profile_version, profile)
+
+def _cached_profile(user_id, min_version):
+    entry = _profile_cache.get(user_id)
+    if entry is None:
+        return None
+
+    checked_at, profile_version, profile = entry
+    if profile_version < min_version or time.monotonic() - checked_at >= PROFILE_CACHE_TTL:
+        return None
+    return profile
 
 def lambda_handler(event, context):
     dynamodb = boto3.resource('dynamodb')
     table = dynamodb.Table('secdrive_users')
-    
+
     try:
         user_id = event['queryStringParameters']['user_id']
-        
-        # Query user profile from DynamoDB
+        # Clients pass the version store_user_data returned to read their own writes
+        min_version = event['queryStringParameters'].get('min_version') or '0'
+        if not min_version.isdecimal():
+            return error_response(400, 'min_version must be a non-negative integer')
+        min_version = int(min_version)
+
+        # Charge the user's rate limit before any AWS call
+        throttled = admit(event, user_id, 'get_user_profile')
+        if throttled:
+            return throttled
+
+        profile = _cached_profile(user_id, min_version)
+        if profile is not None:
+            return json_response(200, profile)
+
+        # GetItem costs the same whatever it projects, so an expired entry is refreshed with one full read.
+        # Only reads that must not go backwards (a requested version or a cached one) need to be consistent.
         response = table.get_item(
             Key={
                 'user_id': user_id
-            }
+            },
+            ConsistentRead=min_version > 0 or user_id in _profile_cache
         )
-        
+
         if 'Item' in response:
             user_data = response['Item']
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type',
-                    'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-                },
-                'body': json.dumps({
-                    'user_id': user_data.get('user_id'),
-                    'email': user_data.get('email'),
-                    'first_name': user_data.get('first_name'),
-                    'last_name': user_data.get('last_name')
-                })
+            profile = {
+                'user_id': user_data.get('user_id'),
+                'email': user_data.get('email'),
+                'first_name': user_data.get('first_name'),
+                'last_name': user_data.get('last_name')
             }
+            _cache_put(user_id, user_data.get('profile_version', 0), profile)
+            return json_response(200, profile)
         else:
-            return {
-                'statusCode': 404,
-                'headers': {
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Headers': 'Content-Type',
-                    'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-                },
-                'body': json.dumps({'error': 'User not found'})
-            }
-        
+            _profile_cache.pop(user_id, None)
+            return error_response(404, 'User not found')
+
     except ClientError as e:
         print("ClientError:", str(e))
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-            },
-            'body': json.dumps({'error': str(e)})
-        }
-    
+        return error_response(500, str(e))
+
     except Exception as e:
         print("Exception:", str(e))
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-            },
-            'body': json.dumps({'error': str(e)})
-        }
+        return error_response(500, str(e))
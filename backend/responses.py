@@ -0,0 +1,122 @@
+import base64
+import gzip
+import json
+from decimal import Decimal
+
+try:
+    import brotli  # Optional, only used when bundled with the function
+except ImportError:
+    brotli = None
+
+# Headers shared by every API response, built once per container
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type',
+    'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
+}
+
+JSON_HEADERS = dict(CORS_HEADERS, **{'Content-Type': 'application/json'})
+
+# Bodies smaller than this are sent as-is, compressing them costs more than it saves
+COMPRESSION_THRESHOLD = 1024
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 5
+
+
+def _default(obj):
+    # DynamoDB returns every number as a Decimal
+    if isinstance(obj, Decimal):
+        # Non-integral values go out as strings, a float would round them
+        return int(obj) if obj == obj.to_integral_value() else str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# One encoder shared by every response, so all handlers emit the same compact JSON
+_encoder = json.JSONEncoder(default=_default, ensure_ascii=False, separators=(',', ':'))
+
+
+def dumps(payload):
+    """Serialize a payload to a compact JSON string, converting DynamoDB Decimals."""
+    return _encoder.encode(payload)
+
+
+def _accepted_encodings(event):
+    headers = (event or {}).get('headers') or {}
+    accept_encoding = headers.get('accept-encoding') or headers.get('Accept-Encoding') or ''
+
+    accepted = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def negotiate_encoding(event):
+    """Pick 'br', 'gzip' or None based on the request's Accept-Encoding header.
+
+    The supported coding with the highest q-value wins, br on a tie.
+    """
+    accepted = _accepted_encodings(event)
+    wildcard = accepted.get('*', 0.0)
+    supported = (['br'] if brotli is not None else []) + ['gzip']
+    best, best_quality = None, 0.0
+    for coding in supported:
+        quality = accepted.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def json_response(status_code, payload, event=None, headers=None):
+    """Build an API Gateway proxy response with a JSON body.
+
+    When the request's Accept-Encoding allows it and the body is larger than
+    COMPRESSION_THRESHOLD, the body is compressed and returned base64 encoded.
+    Extra headers are added on top of the shared JSON_HEADERS.
+    """
+    body = dumps(payload)
+    if headers:
+        headers = dict(JSON_HEADERS, **headers)
+    else:
+        headers = JSON_HEADERS
+
+    if event is not None and len(body) >= COMPRESSION_THRESHOLD:
+        encoding = negotiate_encoding(event)
+        if encoding:
+            headers = dict(headers)
+            headers['Content-Encoding'] = encoding
+            headers['Vary'] = 'Accept-Encoding'
+            return {
+                'statusCode': status_code,
+                'headers': headers,
+                'body': base64.b64encode(compress(body.encode('utf-8'), encoding)).decode('ascii'),
+                'isBase64Encoded': True
+            }
+
+    return {
+        'statusCode': status_code,
+        'headers': headers,
+        'body': body
+    }
+
+
+def error_response(status_code, message, event=None, headers=None):
+    return json_response(status_code, {'error': message}, event, headers)
@@ -1,7 +1,9 @@
-import simplejson as json
+import json
 import boto3
 from boto3.dynamodb.conditions import Key, Attr
 from botocore.exceptions import ClientError
+from responses import json_response, error_response
+from throttle import admit
 
 def lambda_handler(event, context): # Lambda handler function, called when the Lambda is triggered by an event
     dynamodb = boto3.resource('dynamodb') # Create a DynamoDB resource
@@ -12,6 +14,12 @@ def lambda_handler(event, context): # Lambda handler function, called when the L
         body = json.loads(event['body'])
         print(body)
         operation = event['queryStringParameters']['operation']
+        profile_version = None
+
+        # Charge the user's rate limit before any AWS call
+        throttled = admit(event, body.get('user_id'), 'store_user_data')
+        if throttled:
+            return throttled
 
         if operation == 'register':
             user_id = body['user_id']
@@ -19,57 +27,68 @@ def lambda_handler(event, context): # Lambda handler function, called when the L
             first_name = body['firstName']
             last_name = body['lastName']
 
-            response = table.put_item(Item={
-                'user_id': user_id,
-                'email': email,
-                'first_name': first_name,
-                'last_name': last_name
-            })
-
-            print(response)
-        elif operation == 'update':
-            user_id = body['user_id']
-            update_expression = "SET " + ", ".join([f"{key} = :{key}" for key in body if key != 'user_id'])
-            expression_attribute_values = {f":{key}": value for key, value in body.items() if key != 'user_id'}
-
+            # Bump the profile version so cached copies in get_user_profile are rejected
             response = table.update_item(
                 Key={
                     'user_id': user_id
                 },
-                UpdateExpression=update_expression,
-                ExpressionAttributeValues=expression_attribute_values
+                UpdateExpression="SET email = :email, first_name = :first_name, last_name = :last_name ADD profile_version :one",
+                ExpressionAttributeValues={
+                    ':email': email,
+                    ':first_name': first_name,
+                    ':last_name': last_name,
+                    ':one': 1
+                },
+                ReturnValues='UPDATED_NEW'
             )
+            profile_version = response['Attributes']['profile_version']
 
             print(response)
+        elif operation == 'update':
+            user_id = body['user_id']
+            # profile_version is managed here, clients can't set it
+            fields = {key: value for key, value in body.items() if key not in ('user_id', 'profile_version')}
+
+            if fields:
+                placeholders = [f"f{index}" for index in range(len(fields))]
+                expression_attribute_names = {f"#{name}": key for name, key in zip(placeholders, fields)}
+                expression_attribute_values = {f":{name}": value for name, value in zip(placeholders, fields.values())}
+                expression_attribute_values[':one'] = 1
+                update_expression = "SET " + ", ".join([f"#{name} = :{name}" for name in placeholders]) + " ADD profile_version :one"
+                # Only bump the version when a field actually differs, so cached profiles stay valid.
+                # A failed condition is still billed as a write, this saves invalidations, not capacity.
+                condition_expression = " OR ".join([f"attribute_not_exists(#{name}) OR #{name} <> :{name}" for name in placeholders])
+
+                try:
+                    response = table.update_item(
+                        Key={
+                            'user_id': user_id
+                        },
+                        UpdateExpression=update_expression,
+                        ConditionExpression=condition_expression,
+                        ExpressionAttributeNames=expression_attribute_names,
+                        ExpressionAttributeValues=expression_attribute_values,
+                        ReturnValues='UPDATED_NEW',
+                        ReturnValuesOnConditionCheckFailure='ALL_OLD'
+                    )
+                    profile_version = response['Attributes']['profile_version']
+                except ClientError as e:
+                    if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                        raise
+                    # Nothing changed, keep the stored version
+                    print("Profile unchanged, keeping version")
+                    response = e.response
+                    profile_version = int(response.get('Item', {}).get('profile_version', {}).get('N', 0))
+
+                print(response)
 
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-            },
-            'body': json.dumps({'message': 'User details stored successfully'})
-        }
+        return json_response(200, {
+            'message': 'User details stored successfully',
+            'profile_version': profile_version
+        })
     
     except ClientError as e:
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-            },
-            'body': json.dumps({'error': str(e)})
-        }
+        return error_response(500, str(e))
 
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
-            },
-            'body': json.dumps({'error': str(e)}) # Return an error message as JSON
-        }
\ No newline at end of file
+        return error_response(500, str(e)) # Return an error message as JSON
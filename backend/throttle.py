@@ -0,0 +1,168 @@
+import math
+import time
+import boto3
+from botocore.exceptions import ClientError
+from responses import error_response
+
+RATE_LIMIT_TABLE = 'secdrive_rate_limits'
+
+# Token cost of each route, KMS and listing calls are the expensive ones
+ROUTE_COSTS = {
+    'get_user_profile': 1,
+    'store_user_data': 1,
+    'confirm_upload': 1,
+    'generate_presigned_url': 2,
+    'delete_file': 2,
+    'get_user_data': 3,
+    'generate_data_key': 4,
+    'decrypt_data_key': 4,
+    'download_archive': 20,
+    'download_archive_status': 1
+}
+
+BUCKET_CAPACITY = 100    # Burst size per user, in tokens
+REFILL_RATE = 10         # Tokens added back per second
+WINDOW_SECONDS = 60      # Length of the shared per-user window kept in DynamoDB
+WINDOW_BUDGET = BUCKET_CAPACITY + REFILL_RATE * WINDOW_SECONDS
+SYNC_BATCH_COST = 20     # Flush local spend to DynamoDB once this many tokens are pending
+# Each source address is also held to this many users' worth of limits. It is a coarse abuse
+# ceiling, not a share: an office or campus behind one NAT gets 20 users flat out at once,
+# far more than its users really send. Raise it if a large site hits it.
+ADDRESS_SCALE = 20
+MAX_TRACKED_USERS = 4096
+
+
+class _Bucket:
+    __slots__ = ('tokens', 'refilled_at', 'window', 'window_consumed', 'pending', 'blocked_until')
+
+    def __init__(self, now, window, capacity):
+        self.tokens = capacity
+        self.refilled_at = now
+        self.window = window
+        self.window_consumed = 0  # Spend across all containers as of the last sync
+        self.pending = 0          # Local spend not yet written to DynamoDB
+        self.blocked_until = 0
+
+
+class RateLimiter:
+    """Per-user and per-address token buckets kept in container memory.
+
+    Each container enforces BUCKET_CAPACITY / REFILL_RATE locally without any
+    AWS call. Spend is also added to a per-user counter in DynamoDB in batches
+    of SYNC_BATCH_COST, so a user spread across many containers is still held
+    to WINDOW_BUDGET tokens per window. Light users never reach a batch and
+    cost no writes at all.
+    """
+
+    def __init__(self, table=None, clock=time.time):
+        self._table = table
+        self._clock = clock
+        self._buckets = {}
+
+    @property
+    def table(self):
+        if self._table is None:
+            self._table = boto3.resource('dynamodb').Table(RATE_LIMIT_TABLE)
+        return self._table
+
+    def _bucket(self, user_id, now, window, capacity):
+        bucket = self._buckets.pop(user_id, None)
+        if bucket is None:
+            bucket = _Bucket(now, window, capacity)
+            if len(self._buckets) >= MAX_TRACKED_USERS:
+                # Dicts keep insertion order, so the first key is the least recently used
+                del self._buckets[next(iter(self._buckets))]
+        self._buckets[user_id] = bucket
+        return bucket
+
+    def _sync(self, user_id, bucket):
+        try:
+            response = self.table.update_item(
+                Key={
+                    'limit_key': f"{user_id}#{bucket.window}"
+                },
+                UpdateExpression="ADD consumed :pending SET expires_at = if_not_exists(expires_at, :expires_at)",
+                ExpressionAttributeValues={
+                    ':pending': bucket.pending,
+                    ':expires_at': (bucket.window + 2) * WINDOW_SECONDS
+                },
+                ReturnValues='UPDATED_NEW'
+            )
+            bucket.window_consumed = int(response['Attributes']['consumed'])
+        except ClientError as e:
+            # Fail open, the local bucket still applies
+            print(f"Rate limit sync failed for {user_id}: {str(e)}")
+            bucket.window_consumed += bucket.pending
+        bucket.pending = 0
+
+    def check(self, user_id, route, scale=1):
+        """Charge the route's cost to the user.
+
+        scale multiplies the bucket capacity, refill rate and window budget.
+        Returns 0 when the request is admitted, otherwise the number of
+        seconds the caller should wait before retrying.
+        """
+        now = self._clock()
+        window = int(now // WINDOW_SECONDS)
+        capacity = BUCKET_CAPACITY * scale
+        bucket = self._bucket(user_id, now, window, capacity)
+        cost = ROUTE_COSTS.get(route, 1)
+
+        if bucket.window != window:
+            # Unsynced spend belongs to the finished window, it must not count against the new one
+            bucket.window = window
+            bucket.window_consumed = 0
+            bucket.pending = 0
+            bucket.blocked_until = 0
+
+        if now < bucket.blocked_until:
+            return math.ceil(bucket.blocked_until - now)
+
+        bucket.tokens = min(capacity, bucket.tokens + (now - bucket.refilled_at) * REFILL_RATE * scale)
+        bucket.refilled_at = now
+        if bucket.tokens < cost:
+            return max(1, math.ceil((cost - bucket.tokens) / (REFILL_RATE * scale)))
+
+        bucket.tokens -= cost
+        bucket.pending += cost
+        if bucket.pending >= SYNC_BATCH_COST:
+            self._sync(user_id, bucket)
+
+        if bucket.window_consumed + bucket.pending > WINDOW_BUDGET * scale:
+            # Over the shared budget, shed everything until the window rolls over
+            bucket.blocked_until = (window + 1) * WINDOW_SECONDS
+        return 0
+
+    def check_request(self, user_id, source_ip, route):
+        """Charge a request to the user and then to its source address.
+
+        user_id comes from the request and nothing verifies it, so it can't be
+        trusted on its own. User buckets are scoped to the address, so requests
+        sent with someone else's user_id from another address can't use up
+        that user's budget. The address bucket stops a client from getting a
+        fresh bucket by sending a new user_id each time. Requests a user's own
+        bucket rejects are never charged to the address, so one noisy user
+        can't starve the others behind the same NAT. Without a source address
+        only the user bucket applies, never a bucket shared by everyone.
+        """
+        retry_after = 0
+        if user_id:
+            retry_after = self.check(f"{user_id}@{source_ip}" if source_ip else user_id, route)
+        if not retry_after and source_ip:
+            retry_after = self.check(f"ip#{source_ip}", route, scale=ADDRESS_SCALE)
+        return retry_after
+
+
+_limiter = RateLimiter()
+
+
+def admit(event, user_id, route):
+    """Return a 429 response if the caller is over their limit for this route, otherwise None."""
+    request_context = (event or {}).get('requestContext') or {}
+    # HTTP API payload format 1.0 (the integration default) and 2.0 put the caller's address in different places
+    source_ip = (request_context.get('identity') or {}).get('sourceIp') or (request_context.get('http') or {}).get('sourceIp')
+    retry_after = _limiter.check_request(user_id, source_ip, route)
+    if retry_after:
+        print(f"Throttled {user_id} from {source_ip} on {route}, retry after {retry_after}s")
+        return error_response(429, 'Too many requests, please slow down', headers={'Retry-After': str(retry_after)})
+    return None
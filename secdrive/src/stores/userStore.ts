@@ -6,9 +6,10 @@ export const useUserStore = defineStore('user', {
         userData: null,
     }),
     actions: {
-        async fetchUserData(userId: any) {
+        async fetchUserData(userId: any, minVersion?: number) {
             try {
-                const response = await api.get(`/getUserProfile?user_id=${userId}`);
+                const versionParam = minVersion ? `&min_version=${minVersion}` : '';
+                const response = await api.get(`/getUserProfile?user_id=${userId}${versionParam}`);
                 this.userData = response.data;
                 console.log('Fetched user profile:', response.data);
             } catch (error) {
@@ -23,8 +24,8 @@ export const useUserStore = defineStore('user', {
                     ...userData
                 });
                 
-                // Update local store after successful API call
-                await this.fetchUserData(userId);
+                // Update local store after successful API call, skipping any cached older profile
+                await this.fetchUserData(userId, response.data.profile_version);
                 return response.data;
             } catch (error) {
                 console.error('Failed to update user data:', error);
@@ -18,7 +18,7 @@ resource "aws_apigatewayv2_api" "api_gw_secdrive" {
       "Access-Control-Allow-Headers",
       "Access-Control-Allow-Methods"
     ]
-    expose_headers = ["ETag", "X-Amz-Request-Id"]
+    expose_headers = ["ETag", "X-Amz-Request-Id", "Retry-After"]
     max_age = 86400
     allow_credentials = false
   }
@@ -140,6 +140,13 @@ resource "aws_apigatewayv2_integration" "delete_file_integration" { // Create an
   integration_uri  = aws_lambda_function.delete_file.invoke_arn
 }
 
+resource "aws_apigatewayv2_integration" "download_archive_integration" { // Create an integration for building multi-file archives
+  api_id               = aws_apigatewayv2_api.api_gw_secdrive.id
+  integration_type     = "AWS_PROXY"
+  integration_uri      = aws_lambda_function.download_archive.invoke_arn
+  timeout_milliseconds = 30000
+}
+
 // Define the routes for the API Gateway
 resource "aws_apigatewayv2_route" "route_store_user_data" {
   api_id    = aws_apigatewayv2_api.api_gw_secdrive.id
@@ -189,6 +196,18 @@ resource "aws_apigatewayv2_route" "route_delete_file" {
   target    = "integrations/${aws_apigatewayv2_integration.delete_file_integration.id}"
 }
 
+resource "aws_apigatewayv2_route" "route_download_archive" {
+  api_id    = aws_apigatewayv2_api.api_gw_secdrive.id
+  route_key = "POST /downloadArchive"
+  target    = "integrations/${aws_apigatewayv2_integration.download_archive_integration.id}"
+}
+
+resource "aws_apigatewayv2_route" "route_download_archive_status" {
+  api_id    = aws_apigatewayv2_api.api_gw_secdrive.id
+  route_key = "GET /downloadArchive"
+  target    = "integrations/${aws_apigatewayv2_integration.download_archive_integration.id}"
+}
+
 resource "aws_lambda_permission" "store_user_data_api_gateway_permission" {
   statement_id  = "AllowExecutionFromAPIGateway"
   action        = "lambda:InvokeFunction"
@@ -253,6 +272,14 @@ resource "aws_lambda_permission" "delete_file_api_gateway_permission" {
   source_arn    = "${aws_apigatewayv2_api.api_gw_secdrive.execution_arn}/*"
 }
 
+resource "aws_lambda_permission" "download_archive_api_gateway_permission" {
+  statement_id  = "AllowExecutionFromAPIGateway"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.download_archive.function_name
+  principal     = "apigateway.amazonaws.com"
+  source_arn    = "${aws_apigatewayv2_api.api_gw_secdrive.execution_arn}/*"
+}
+
 resource "aws_apigatewayv2_stage" "default_stage" { // Create a stage for the API Gateway
   api_id      = aws_apigatewayv2_api.api_gw_secdrive.id
   name        = "$default"
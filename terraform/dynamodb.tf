@@ -30,4 +30,20 @@ resource "aws_dynamodb_table" "secdrive_users" { // Create a DynamoDB table for
     type = "S"
   }
 
-}
\ No newline at end of file
+}
+
+resource "aws_dynamodb_table" "secdrive_rate_limits" { // Create a DynamoDB table for the per-user rate limit counters
+  name         = "secdrive_rate_limits"
+  billing_mode = local.dynamodb_billing_mode // Set the billing mode to pay per request
+  hash_key     = "limit_key"                 // Set the hash key to "<user_id>#<window>"
+
+  attribute {
+    name = "limit_key"
+    type = "S"
+  }
+
+  ttl { // Expire counters once their window has passed
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+}
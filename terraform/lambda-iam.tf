@@ -30,6 +30,23 @@ resource "aws_iam_policy" "lambda_logging_policy" {
   })
 }
 
+// Rate limit policy for all Lambda functions - updates the per-user counters
+resource "aws_iam_policy" "lambda_rate_limit_policy" {
+  name = "lambda_rate_limit_policy"
+  policy = jsonencode({
+    "Version" : "2012-10-17",
+    "Statement" : [
+      {
+        "Action" : [
+          "dynamodb:UpdateItem"
+        ],
+        "Effect" : "Allow",
+        "Resource" : aws_dynamodb_table.secdrive_rate_limits.arn
+      }
+    ]
+  })
+}
+
 // Policy for store_user_data Lambda - only needs DynamoDB operations on users table
 resource "aws_iam_policy" "store_user_data_policy" {
   name = "store_user_data_policy"
@@ -185,6 +202,70 @@ resource "aws_iam_policy" "delete_file_policy" {
   })
 }
 
+// Policy for download_archive Lambda - checks file metadata, starts build_archive and reads build status under archives/
+resource "aws_iam_policy" "download_archive_policy" {
+  name = "download_archive_policy"
+  policy = jsonencode({
+    "Version" : "2012-10-17",
+    "Statement" : [
+      {
+        "Action" : [
+          "dynamodb:BatchGetItem"
+        ],
+        "Effect" : "Allow",
+        "Resource" : aws_dynamodb_table.secdrive_user_files.arn
+      },
+      {
+        "Action" : [
+          "s3:GetObject",
+          "s3:PutObject"
+        ],
+        "Effect" : "Allow",
+        "Resource" : "${aws_s3_bucket.s3_user_data.arn}/archives/*"
+      },
+      {
+        "Action" : [
+          "lambda:InvokeFunction"
+        ],
+        "Effect" : "Allow",
+        "Resource" : aws_lambda_function.build_archive.arn
+      }
+    ]
+  })
+}
+
+// Policy for build_archive Lambda - reads file metadata and objects, writes archives and their status under archives/
+resource "aws_iam_policy" "build_archive_policy" {
+  name = "build_archive_policy"
+  policy = jsonencode({
+    "Version" : "2012-10-17",
+    "Statement" : [
+      {
+        "Action" : [
+          "dynamodb:BatchGetItem"
+        ],
+        "Effect" : "Allow",
+        "Resource" : aws_dynamodb_table.secdrive_user_files.arn
+      },
+      {
+        "Action" : [
+          "s3:GetObject"
+        ],
+        "Effect" : "Allow",
+        "Resource" : "${aws_s3_bucket.s3_user_data.arn}/*"
+      },
+      {
+        "Action" : [
+          "s3:PutObject",
+          "s3:AbortMultipartUpload"
+        ],
+        "Effect" : "Allow",
+        "Resource" : "${aws_s3_bucket.s3_user_data.arn}/archives/*"
+      }
+    ]
+  })
+}
+
 // IAM Roles for each Lambda function
 resource "aws_iam_role" "store_user_data_role" {
   name               = "store_user_data_role"
@@ -226,6 +307,16 @@ resource "aws_iam_role" "delete_file_role" {
   assume_role_policy = data.aws_iam_policy_document.lambda_assume_role.json
 }
 
+resource "aws_iam_role" "download_archive_role" {
+  name               = "download_archive_role"
+  assume_role_policy = data.aws_iam_policy_document.lambda_assume_role.json
+}
+
+resource "aws_iam_role" "build_archive_role" {
+  name               = "build_archive_role"
+  assume_role_policy = data.aws_iam_policy_document.lambda_assume_role.json
+}
+
 # Policy attachments for each Lambda function
 resource "aws_iam_role_policy_attachment" "store_user_data_logging" {
   role       = aws_iam_role.store_user_data_role.name
@@ -237,6 +328,11 @@ resource "aws_iam_role_policy_attachment" "store_user_data_policy_attachment" {
   policy_arn = aws_iam_policy.store_user_data_policy.arn
 }
 
+resource "aws_iam_role_policy_attachment" "store_user_data_rate_limit" {
+  role       = aws_iam_role.store_user_data_role.name
+  policy_arn = aws_iam_policy.lambda_rate_limit_policy.arn
+}
+
 resource "aws_iam_role_policy_attachment" "get_user_data_logging" {
   role       = aws_iam_role.get_user_data_role.name
   policy_arn = aws_iam_policy.lambda_logging_policy.arn
@@ -247,6 +343,11 @@ resource "aws_iam_role_policy_attachment" "get_user_data_policy_attachment" {
   policy_arn = aws_iam_policy.get_user_data_policy.arn
 }
 
+resource "aws_iam_role_policy_attachment" "get_user_data_rate_limit" {
+  role       = aws_iam_role.get_user_data_role.name
+  policy_arn = aws_iam_policy.lambda_rate_limit_policy.arn
+}
+
 resource "aws_iam_role_policy_attachment" "get_user_profile_logging" {
   role       = aws_iam_role.get_user_profile_role.name
   policy_arn = aws_iam_policy.lambda_logging_policy.arn
@@ -257,6 +358,11 @@ resource "aws_iam_role_policy_attachment" "get_user_profile_policy_attachment" {
   policy_arn = aws_iam_policy.get_user_profile_policy.arn
 }
 
+resource "aws_iam_role_policy_attachment" "get_user_profile_rate_limit" {
+  role       = aws_iam_role.get_user_profile_role.name
+  policy_arn = aws_iam_policy.lambda_rate_limit_policy.arn
+}
+
 resource "aws_iam_role_policy_attachment" "generate_presigned_url_logging" {
   role       = aws_iam_role.generate_presigned_url_role.name
   policy_arn = aws_iam_policy.lambda_logging_policy.arn
@@ -267,6 +373,11 @@ resource "aws_iam_role_policy_attachment" "generate_presigned_url_policy_attachm
   policy_arn = aws_iam_policy.generate_presigned_url_policy.arn
 }
 
+resource "aws_iam_role_policy_attachment" "generate_presigned_url_rate_limit" {
+  role       = aws_iam_role.generate_presigned_url_role.name
+  policy_arn = aws_iam_policy.lambda_rate_limit_policy.arn
+}
+
 resource "aws_iam_role_policy_attachment" "confirm_upload_logging" {
   role       = aws_iam_role.confirm_upload_role.name
   policy_arn = aws_iam_policy.lambda_logging_policy.arn
@@ -277,6 +388,11 @@ resource "aws_iam_role_policy_attachment" "confirm_upload_policy_attachment" {
   policy_arn = aws_iam_policy.confirm_upload_policy.arn
 }
 
+resource "aws_iam_role_policy_attachment" "confirm_upload_rate_limit" {
+  role       = aws_iam_role.confirm_upload_role.name
+  policy_arn = aws_iam_policy.lambda_rate_limit_policy.arn
+}
+
 resource "aws_iam_role_policy_attachment" "generate_data_key_logging" {
   role       = aws_iam_role.generate_data_key_role.name
   policy_arn = aws_iam_policy.lambda_logging_policy.arn
@@ -287,6 +403,11 @@ resource "aws_iam_role_policy_attachment" "generate_data_key_policy_attachment"
   policy_arn = aws_iam_policy.generate_data_key_policy.arn
 }
 
+resource "aws_iam_role_policy_attachment" "generate_data_key_rate_limit" {
+  role       = aws_iam_role.generate_data_key_role.name
+  policy_arn = aws_iam_policy.lambda_rate_limit_policy.arn
+}
+
 resource "aws_iam_role_policy_attachment" "decrypt_data_key_logging" {
   role       = aws_iam_role.decrypt_data_key_role.name
   policy_arn = aws_iam_policy.lambda_logging_policy.arn
@@ -297,6 +418,11 @@ resource "aws_iam_role_policy_attachment" "decrypt_data_key_policy_attachment" {
   policy_arn = aws_iam_policy.decrypt_data_key_policy.arn
 }
 
+resource "aws_iam_role_policy_attachment" "decrypt_data_key_rate_limit" {
+  role       = aws_iam_role.decrypt_data_key_role.name
+  policy_arn = aws_iam_policy.lambda_rate_limit_policy.arn
+}
+
 resource "aws_iam_role_policy_attachment" "delete_file_logging" {
   role       = aws_iam_role.delete_file_role.name
   policy_arn = aws_iam_policy.lambda_logging_policy.arn
@@ -305,4 +431,34 @@ resource "aws_iam_role_policy_attachment" "delete_file_logging" {
 resource "aws_iam_role_policy_attachment" "delete_file_policy_attachment" {
   role       = aws_iam_role.delete_file_role.name
   policy_arn = aws_iam_policy.delete_file_policy.arn
-}
\ No newline at end of file
+}
+
+resource "aws_iam_role_policy_attachment" "delete_file_rate_limit" {
+  role       = aws_iam_role.delete_file_role.name
+  policy_arn = aws_iam_policy.lambda_rate_limit_policy.arn
+}
+
+resource "aws_iam_role_policy_attachment" "download_archive_logging" {
+  role       = aws_iam_role.download_archive_role.name
+  policy_arn = aws_iam_policy.lambda_logging_policy.arn
+}
+
+resource "aws_iam_role_policy_attachment" "download_archive_policy_attachment" {
+  role       = aws_iam_role.download_archive_role.name
+  policy_arn = aws_iam_policy.download_archive_policy.arn
+}
+
+resource "aws_iam_role_policy_attachment" "download_archive_rate_limit" {
+  role       = aws_iam_role.download_archive_role.name
+  policy_arn = aws_iam_policy.lambda_rate_limit_policy.arn
+}
+
+resource "aws_iam_role_policy_attachment" "build_archive_logging" {
+  role       = aws_iam_role.build_archive_role.name
+  policy_arn = aws_iam_policy.lambda_logging_policy.arn
+}
+
+resource "aws_iam_role_policy_attachment" "build_archive_policy_attachment" {
+  role       = aws_iam_role.build_archive_role.name
+  policy_arn = aws_iam_policy.build_archive_policy.arn
+}
@@ -76,4 +76,29 @@ resource "aws_lambda_function" "delete_file" { // Create the Lambda function for
   timeout       = local.lambda_timeout
   role          = aws_iam_role.delete_file_role.arn
   filename      = "../backend/delete_file.zip"
-}
\ No newline at end of file
+}
+
+resource "aws_lambda_function" "download_archive" { // Create the Lambda function for building multi-file archives
+  function_name = "download_archive"
+  handler       = "download_archive.lambda_handler"
+  runtime       = local.lambda_runtime
+  memory_size   = local.lambda_memory_size
+  timeout       = local.lambda_timeout
+  role          = aws_iam_role.download_archive_role.arn
+  filename      = "../backend/download_archive.zip"
+}
+
+resource "aws_lambda_function" "build_archive" { // Create the Lambda function that builds archives asynchronously
+  function_name = "build_archive"
+  handler       = "build_archive.lambda_handler"
+  runtime       = local.lambda_runtime
+  memory_size   = local.lambda_memory_size
+  timeout       = local.archive_lambda_timeout
+  role          = aws_iam_role.build_archive_role.arn
+  filename      = "../backend/build_archive.zip"
+}
+
+resource "aws_lambda_function_event_invoke_config" "build_archive_invoke_config" { // Failures are recorded in the status object, retrying would only repeat them
+  function_name          = aws_lambda_function.build_archive.function_name
+  maximum_retry_attempts = 0
+}
@@ -88,3 +88,23 @@ resource "aws_s3_bucket_public_access_block" "s3_user_data_public_access_block"
   restrict_public_buckets = true
 }
 
+resource "aws_s3_bucket_lifecycle_configuration" "s3_user_data_archives" { // Clean up generated archives and abandoned uploads
+  bucket = aws_s3_bucket.s3_user_data.id
+
+  rule {
+    id     = "expire-archives"
+    status = "Enabled"
+
+    filter {
+      prefix = "archives/"
+    }
+
+    expiration {
+      days = 1
+    }
+
+    abort_incomplete_multipart_upload {
+      days_after_initiation = 1
+    }
+  }
+}